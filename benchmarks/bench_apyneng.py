@@ -0,0 +1,347 @@
+"""
+Бенчмарки для основных операций apyneng на синтетическом каталоге exercises.
+
+Для бенчмарков создается временный каталог с репозиторием студента, локальными
+bare репозиториями, которые заменяют TASKS_URL и ANSWERS_URL, и локальным
+HTTP сервером, который заменяет Github API.
+
+Запуск и сравнение результатов:
+
+    python benchmarks/bench_apyneng.py run --chapters 14 --tasks 10
+    python benchmarks/bench_apyneng.py compare .benchmarks/a.json .benchmarks/b.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import click
+
+from advpyneng_cli_course import TASK_NUMBER_DIR_MAP
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, ".benchmarks")
+STUDENT_REPO_NAME = "advpyneng-1-bench-user"
+
+TASK_TEMPLATE = '''
+def task_function(value):
+    return value * {number}
+'''
+TEST_TEMPLATE = '''
+import pytest
+from task_{chapter}_{number} import task_function
+
+
+@pytest.mark.parametrize("value", range({tests}))
+def test_task_function(value):
+    assert task_function(value) == value * {number}
+'''
+
+
+def git(*args, cwd=None):
+    subprocess.run(
+        ["git", *args],
+        cwd=cwd,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def make_course_tree(root, chapters, tasks, tests):
+    """
+    Создает каталог root/exercises с chapters разделами, в каждом разделе
+    tasks заданий, в каждом файле тестов tests параметризированных тестов.
+    """
+    chapter_dirs = list(TASK_NUMBER_DIR_MAP.items())[:chapters]
+    for chapter, chapter_dir in chapter_dirs:
+        pth = os.path.join(root, "exercises", chapter_dir)
+        os.makedirs(pth, exist_ok=True)
+        for number in range(1, tasks + 1):
+            with open(os.path.join(pth, f"task_{chapter}_{number}.py"), "w") as f:
+                f.write(TASK_TEMPLATE.format(number=number))
+            test_file = os.path.join(pth, f"test_task_{chapter}_{number}.py")
+            with open(test_file, "w") as f:
+                f.write(
+                    TEST_TEMPLATE.format(chapter=chapter, number=number, tests=tests)
+                )
+    return [chapter_dir for _, chapter_dir in chapter_dirs]
+
+
+def make_bare_repo(src_dir, bare_dir):
+    """
+    Создает bare репозиторий bare_dir с содержимым каталога src_dir
+    """
+    git("init", "-q", "-b", "main", cwd=src_dir)
+    git("add", "-A", cwd=src_dir)
+    git("config", "user.name", "bench", cwd=src_dir)
+    git("config", "user.email", "bench@localhost", cwd=src_dir)
+    git("commit", "-q", "-m", "init", cwd=src_dir)
+    git("clone", "-q", "--bare", src_dir, bare_dir)
+    git("config", "uploadpack.allowFilter", "true", cwd=bare_dir)
+    return f"file://{bare_dir}"
+
+
+class FakeGithubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"id": 1}'
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_github():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGithubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def best_of(repeat, func, setup=None):
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def current_commit():
+    result = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"],
+        cwd=REPO_ROOT,
+        encoding="utf-8",
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    return result.stdout.strip() or "unknown"
+
+
+def run_benchmarks(workdir, chapters, tasks, tests, repeat):
+    # все каталоги apyneng (~/.advpyneng-*) создаются во временном каталоге.
+    # HOME меняется до импорта модулей apyneng, так как cache.RESULTS_CACHE_DIR
+    # (и пути к очереди сдачи заданий, истории и кэшу байткода) вычисляется
+    # при импорте
+    assert "advpyneng_cli_course.cache" not in sys.modules
+    os.environ["HOME"] = os.path.join(workdir, "home")
+    os.makedirs(os.environ["HOME"])
+
+    from advpyneng_cli_course import utils
+    from advpyneng_cli_course.apyneng import _get_tasks_tests_from_cli
+    from advpyneng_cli_course.plugin import OutcomeCollector
+
+    upstream = os.path.join(workdir, "upstream")
+    chapter_dirs = make_course_tree(upstream, chapters, tasks, tests)
+    utils.TASKS_URL = make_bare_repo(upstream, os.path.join(workdir, "tasks.git"))
+
+    student = os.path.join(workdir, STUDENT_REPO_NAME)
+    shutil.copytree(upstream, student, ignore=shutil.ignore_patterns(".git"))
+    student_remote = os.path.join(workdir, f"{STUDENT_REPO_NAME}.git")
+    make_bare_repo(student, student_remote)
+    git("remote", "add", "origin", student_remote, cwd=student)
+    git("fetch", "-q", "origin", cwd=student)
+    git("branch", "-q", "-u", "origin/main", cwd=student)
+    exercises = os.path.join(student, "exercises")
+    chapter_pth = os.path.join(exercises, chapter_dirs[-1])
+
+    results = {}
+
+    results["cli --help"] = best_of(
+        repeat,
+        lambda: subprocess.run(
+            [sys.executable, "-m", "advpyneng_cli_course.apyneng", "--help"],
+            stdout=subprocess.DEVNULL,
+            check=True,
+        ),
+    )
+
+    class ParamType:
+        def fail(self, message):
+            raise click.BadParameter(message)
+
+    os.chdir(chapter_pth)
+    spec = f"1,2*,3-{max(tasks, 3)}"
+    results["_get_tasks_tests_from_cli"] = best_of(
+        repeat, lambda: _get_tasks_tests_from_cli(ParamType(), spec)
+    )
+
+    collector = OutcomeCollector()
+    for chapter_dir in chapter_dirs:
+        for number in range(1, tasks + 1):
+            for test in range(tests):
+                nodeid = f"test_task_{number}.py::test_task_function[{test}]"
+                collector.outcomes[f"{chapter_dir}/{nodeid}"] = "passed"
+    results["passed_tasks (report parsing)"] = best_of(
+        repeat, collector.passed_tasks
+    )
+
+    os.chdir(os.path.join(upstream, "exercises"))
+    copy_target = os.path.join(workdir, "copy_target")
+    results["copy_chapters (empty target)"] = best_of(
+        repeat,
+        lambda: utils.copy_chapters(copy_target, chapter_dirs),
+        setup=lambda: shutil.rmtree(copy_target, ignore_errors=True),
+    )
+    results["copy_chapters (no changes)"] = best_of(
+        repeat, lambda: utils.copy_chapters(copy_target, chapter_dirs)
+    )
+
+    tasks_repo = os.path.join(os.environ["HOME"], ".advpyneng-course-tasks")
+    os.chdir(exercises)
+    results["update chapters (clone)"] = best_of(
+        repeat,
+        lambda: utils.copy_chapters_from_repo(chapter_dirs),
+        setup=lambda: shutil.rmtree(tasks_repo, ignore_errors=True),
+    )
+    results["update chapters (fetch)"] = best_of(
+        repeat, lambda: utils.copy_chapters_from_repo(chapter_dirs)
+    )
+
+    answers = os.path.join(workdir, "answers")
+    shutil.copytree(
+        os.path.join(upstream, "exercises"),
+        os.path.join(answers, "answers"),
+        ignore=shutil.ignore_patterns("test_*"),
+    )
+    utils.ANSWERS_URL = make_bare_repo(answers, os.path.join(workdir, "answers.git"))
+    answers_repo = os.path.join(os.environ["HOME"], ".advpyneng-answers")
+    os.chdir(chapter_pth)
+    passed_tests = sorted(f for f in os.listdir(".") if f.startswith("test_task_"))
+
+    def remove_answers(remove_repo=False):
+        for answer_file in os.listdir("."):
+            if answer_file.startswith("answer_"):
+                os.remove(answer_file)
+        if remove_repo:
+            shutil.rmtree(answers_repo, ignore_errors=True)
+
+    results["copy_answers (clone)"] = best_of(
+        repeat,
+        lambda: utils.copy_answers(passed_tests),
+        setup=lambda: remove_answers(remove_repo=True),
+    )
+    results["copy_answers (fetch)"] = best_of(
+        repeat, lambda: utils.copy_answers(passed_tests), setup=remove_answers
+    )
+    remove_answers()
+
+    server, api_url = start_fake_github()
+    os.environ["APYNENG_GITHUB_API_URL"] = api_url
+    os.environ["GITHUB_TOKEN"] = "benchmark"
+    os.chdir(chapter_pth)
+    task_files = sorted(f for f in os.listdir(".") if f.startswith("task_"))
+
+    def change_tasks():
+        for task_file in task_files:
+            with open(task_file, "a") as f:
+                f.write("# changed\n")
+
+    results["send_tasks_to_check"] = best_of(
+        repeat,
+        lambda: utils.send_tasks_to_check(task_files),
+        setup=change_tasks,
+    )
+    server.shutdown()
+    return results
+
+
+@click.group()
+def cli():
+    """
+    Бенчмарки apyneng
+    """
+
+
+@cli.command()
+@click.option("--chapters", default=3, help="Количество разделов")
+@click.option("--tasks", default=10, help="Количество заданий в разделе")
+@click.option("--tests", default=20, help="Количество тестов в файле тестов")
+@click.option("--repeat", default=3, help="Количество повторов каждого бенчмарка")
+@click.option("--output", help="Файл для результатов (по умолчанию .benchmarks/)")
+def run(chapters, tasks, tests, repeat, output):
+    """
+    Запустить бенчмарки и сохранить результаты в JSON
+    """
+    commit = current_commit()
+    workdir = tempfile.mkdtemp(prefix="apyneng-bench-")
+    cwd = os.getcwd()
+    home = os.environ.get("HOME")
+    try:
+        with open(os.devnull, "w") as devnull:
+            stdout = sys.stdout
+            sys.stdout = devnull
+            try:
+                timings = run_benchmarks(workdir, chapters, tasks, tests, repeat)
+            finally:
+                sys.stdout = stdout
+    finally:
+        os.chdir(cwd)
+        if home is not None:
+            os.environ["HOME"] = home
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for name, seconds in timings.items():
+        print(f"{name:<34} {seconds * 1000:10.2f} ms")
+
+    result = {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "params": {
+            "chapters": chapters,
+            "tasks": tasks,
+            "tests": tests,
+            "repeat": repeat,
+        },
+        "timings": timings,
+    }
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(
+            RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json"
+        )
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nРезультаты записаны в {output}")
+
+
+@cli.command()
+@click.argument("baseline", type=click.File())
+@click.argument("current", type=click.File())
+def compare(baseline, current):
+    """
+    Сравнить два файла с результатами бенчмарков
+    """
+    baseline = json.load(baseline)
+    current = json.load(current)
+    print(f"{'':<34} {baseline['commit']:>12} {current['commit']:>12}")
+    for name, seconds in current["timings"].items():
+        old = baseline["timings"].get(name)
+        if old is None:
+            print(f"{name:<34} {'-':>12} {seconds * 1000:10.2f}ms")
+            continue
+        ratio = seconds / old if old else float("inf")
+        print(
+            f"{name:<34} {old * 1000:10.2f}ms {seconds * 1000:10.2f}ms"
+            f" {ratio:6.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    cli()
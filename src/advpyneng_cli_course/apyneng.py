@@ -2,13 +2,10 @@ import sys
 import re
 import os
 import json
-from glob import glob
+import time
+from collections import defaultdict
 
 import click
-import pytest
-from rich.console import Console
-from rich.markdown import Markdown
-from pytest_jsonreport.plugin import JSONReport
 
 from advpyneng_cli_course import (
     DEFAULT_BRANCH,
@@ -18,6 +15,24 @@ from advpyneng_cli_course import (
 )
 from advpyneng_cli_course.exceptions import AdvPynengError
 from advpyneng_cli_course.apyneng_docs import DOCS
+from advpyneng_cli_course.profiling import span, enable_profiling, finish_profiling
+from advpyneng_cli_course.cache import (
+    split_cached_tests,
+    update_results_cache,
+    schedule_test_files,
+    recorded_durations,
+)
+from advpyneng_cli_course.submissions import (
+    load_submissions,
+    flush_submissions,
+    flush_pending_submissions,
+)
+from advpyneng_cli_course.daemon import (
+    daemon_supported,
+    daemon_running,
+    start_daemon,
+    stop_daemon,
+)
 from advpyneng_cli_course.utils import (
     red,
     green,
@@ -26,7 +41,6 @@ from advpyneng_cli_course.utils import (
     send_tasks_to_check,
     current_chapter_id,
     current_dir_name,
-    parse_json_report,
     copy_answers,
     update_tasks_and_tests,
     update_chapters_tasks_and_tests,
@@ -50,45 +64,218 @@ def check_current_dir_name(dir_list, message):
         raise click.Abort()
 
 
-def _get_tasks_tests_from_cli(self, value):
-    regex = (
-        r"(?P<all>all)|"
-        r"(?P<number_star>\d\*)|"
-        r"(?P<letters_range>\d[a-i]-[a-i])|"
-        r"(?P<numbers_range>\d-\d)|"
-        r"(?P<single_task>\d[a-i]?)"
+TASKS_SPEC_REGEX = re.compile(
+    r"(?P<all>all)|"
+    r"(?P<cross_range>\d+\.\d+[a-i]?-\d+\.\d+[a-i]?)|"
+    r"(?P<cross_task>\d+\.\d+[a-i]?)|"
+    r"(?P<number_star>\d+\*)|"
+    r"(?P<letters_range>\d+[a-i]-[a-i])|"
+    r"(?P<numbers_range>\d+-\d+)|"
+    r"(?P<single_task>\d+[a-i]?)"
+)
+CROSS_CHAPTER_SPEC_REGEX = re.compile(r"\d+\.\d+")
+TASK_FILE_REGEX = re.compile(
+    r"(?P<test>test_)?task_(?P<chapter>\d+)_(?P<number>\d+)(?P<letter>[a-z]?)\.py"
+)
+TASK_ID_REGEX = re.compile(r"(?:(?P<chapter>\d+)\.)?(?P<number>\d+)(?P<letter>[a-z]?)")
+
+
+def chapter_index(chapter_dir, chapter_id):
+    """
+    Функция один раз читает каталог раздела и возвращает словарь
+    {(номер задания, буква): [файл задания, файл тестов]}.
+    Если файла нет, вместо имени указывается None.
+    """
+    index = {}
+    try:
+        entries = list(os.scandir(chapter_dir or "."))
+    except FileNotFoundError:
+        return index
+    for entry in entries:
+        match = TASK_FILE_REGEX.fullmatch(entry.name)
+        if match and int(match.group("chapter")) == chapter_id:
+            key = (int(match.group("number")), match.group("letter"))
+            files = index.setdefault(key, [None, None])
+            files[1 if match.group("test") else 0] = entry.name
+    return index
+
+
+def _task_id(task_id):
+    match = TASK_ID_REGEX.fullmatch(task_id)
+    chapter = match.group("chapter")
+    return (
+        int(chapter) if chapter else None,
+        int(match.group("number")),
+        match.group("letter"),
     )
-    tasks_list = re.split(r"[ ,]+", value)
-    current_chapter = current_chapter_id()
-    test_files = []
-    task_files = []
-    for task in tasks_list:
-        match = re.fullmatch(regex, task)
-        if match:
-            if task == "all":
-                test_files = sorted(glob(f"test_task_{current_chapter}_*.py"))
-                task_files = sorted(glob(f"task_{current_chapter}_*.py"))
-                break
+
+
+def _select_tasks(match, task, index):
+    """
+    Функция возвращает ключи index, которые соответствуют заданию task
+    из текущего раздела
+    """
+    if match.group("all"):
+        return set(index)
+    elif match.group("number_star"):
+        number = int(task[:-1])
+        return {key for key in index if key[0] == number}
+    elif match.group("letters_range"):
+        number, letters = int(task[:-3]), task[-3:]
+        return {
+            key
+            for key in index
+            if key[0] == number and key[1] and letters[0] <= key[1] <= letters[2]
+        }
+    elif match.group("numbers_range"):
+        start, stop = map(int, task.split("-"))
+        return {key for key in index if start <= key[0] <= stop and not key[1]}
+    else:
+        _, number, letter = _task_id(task)
+        return {(number, letter)} & set(index)
+
+
+def _select_cross_chapter_tasks(match, task, load_index):
+    """
+    Функция возвращает словарь {номер раздела: ключи index} для заданий вида
+    4.1 или 4.1-9.3 (все задания с 4.1 по 9.3 включительно в разделах
+    из TASK_NUMBER_DIR_MAP)
+    """
+    if match.group("cross_task"):
+        chapter, number, letter = _task_id(task)
+        return {chapter: {(number, letter)} & set(load_index(chapter))}
+    start, stop = [_task_id(task_id) for task_id in task.split("-")]
+    # если у последнего задания нет буквы, включаются и задания с буквами
+    stop = stop if stop[2] else (stop[0], stop[1], "z")
+    selected = {}
+    for chapter in TASK_NUMBER_DIR_MAP:
+        if start[0] <= chapter <= stop[0]:
+            selected[chapter] = {
+                key
+                for key in load_index(chapter)
+                if start <= (chapter, *key) <= stop
+            }
+    return selected
+
+
+def _get_tasks_tests_from_cli(self, value):
+    """
+    Функция преобразует строку заданий в три списка файлов:
+    файлы тестов, файлы заданий без тестов и все файлы заданий.
+
+    Каталоги разделов читаются один раз, все части строки заданий
+    выбираются по этому индексу. Задания других разделов (например, 4.1-9.3)
+    указываются с путем относительно текущего каталога.
+    """
+    tasks_list = re.split(r"[ ,]+", value.strip())
+    current_dir = current_dir_name()
+    in_exercises = current_dir == "exercises"
+    current_chapter = None if in_exercises else current_chapter_id()
+    exercises_dir = "" if in_exercises else ".."
+
+    indexes = {}
+
+    def load_index(chapter):
+        if chapter not in indexes:
+            if chapter == current_chapter:
+                chapter_dir = ""
             else:
-                if match.group("letters_range"):
-                    task = f"{task[0]}[{task[1:]}]"  # convert 1a-c to 1[a-c]
-                elif match.group("numbers_range"):
-                    task = f"[{task}]"  # convert 1-3 to [1-3]
+                chapter_dir = os.path.join(
+                    exercises_dir, TASK_NUMBER_DIR_MAP.get(chapter, "")
+                )
+            if chapter == current_chapter or chapter in TASK_NUMBER_DIR_MAP:
+                indexes[chapter] = (chapter_dir, chapter_index(chapter_dir, chapter))
+            else:
+                indexes[chapter] = ("", {})
+        return indexes[chapter][1]
 
-                test_files += glob(f"test_task_{current_chapter}_{task}.py")
-                task_files += glob(f"task_{current_chapter}_{task}.py")
-        else:
+    selected = defaultdict(set)
+    for task in tasks_list:
+        match = TASKS_SPEC_REGEX.fullmatch(task)
+        if not match:
             self.fail(
                 red(
                     f"Данный формат не поддерживается {task}. "
                     "Допустимые форматы в apyneng --help"
                 )
             )
-    tasks_with_tests = set([test.replace("test_", "") for test in test_files])
-    tasks_without_tests = set(task_files) - tasks_with_tests
+        if match.group("cross_task") or match.group("cross_range"):
+            for chapter, keys in _select_cross_chapter_tasks(
+                match, task, load_index
+            ).items():
+                selected[chapter] |= keys
+        elif in_exercises:
+            self.fail(
+                red(
+                    "В каталоге exercises задания надо указывать с номером раздела, "
+                    f"например, 4.1 или 4.1-9.3, а не {task}"
+                )
+            )
+        else:
+            selected[current_chapter] |= _select_tasks(
+                match, task, load_index(current_chapter)
+            )
+
+    return _tasks_tests_files(
+        (indexes[chapter][0], indexes[chapter][1][key])
+        for chapter, keys in selected.items()
+        for key in keys
+    )
+
+
+def _tasks_tests_files(entries):
+    """
+    Функция возвращает три списка файлов: файлы тестов, файлы заданий
+    без тестов и все файлы заданий. entries это пары
+    (каталог раздела, [файл задания, файл тестов]) из chapter_index.
+    """
+    test_files = []
+    task_files = []
+    tasks_without_tests = []
+    for chapter_dir, (task_file, test_file) in entries:
+        if task_file:
+            task_files.append(os.path.join(chapter_dir, task_file))
+            if not test_file:
+                tasks_without_tests.append(task_files[-1])
+        if test_file:
+            test_files.append(os.path.join(chapter_dir, test_file))
     return sorted(test_files), sorted(tasks_without_tests), sorted(task_files)
 
 
+def get_chapters_tasks_tests(chapters):
+    """
+    Функция возвращает те же три списка, что и _get_tasks_tests_from_cli,
+    но для всех заданий указанных разделов. Пути к файлам указываются
+    относительно каталога exercises.
+    """
+    return _tasks_tests_files(
+        (chapter_dir, files)
+        for chapter_dir in chapters
+        for files in chapter_index(chapter_dir, int(chapter_dir.split("_")[0])).values()
+    )
+
+
+def print_chapters_summary(chapters, test_files, passed_tasks):
+    """
+    Выводит общий итог проверки нескольких разделов
+    """
+    print("\nРезультаты проверки разделов:")
+    for chapter in chapters:
+        chapter_tests = [t for t in test_files if t.startswith(chapter + os.sep)]
+        if not chapter_tests:
+            continue
+        chapter_passed = [t for t in passed_tasks if t.startswith(chapter + os.sep)]
+        line = (
+            f"    {chapter:<26} "
+            f"тесты прошли {len(chapter_passed)} из {len(chapter_tests)}"
+        )
+        if len(chapter_passed) == len(chapter_tests):
+            print(green(line))
+        else:
+            print(red(line))
+    print()
+
+
 class CustomTasksType(click.ParamType):
     """
     Класс создает новый тип для click и преобразует
@@ -103,12 +290,16 @@ class CustomTasksType(click.ParamType):
     def convert(self, value, param, ctx):
         if isinstance(value, tuple):
             return value
-        elif value == "all" and current_dir_name() == "exercises":
-            return value
+        elif current_dir_name() == "exercises":
+            # из каталога exercises можно указывать только задания
+            # с номером раздела, например, 4.1-9.3
+            if not CROSS_CHAPTER_SPEC_REGEX.search(value):
+                return value
         elif current_dir_name() not in TASK_DIRS:
             return value
 
-        return _get_tasks_tests_from_cli(self, value)
+        with span("resolve tasks", tasks=value):
+            return _get_tasks_tests_from_cli(self, value)
 
 
 class CustomChapterType(click.ParamType):
@@ -145,7 +336,59 @@ class CustomChapterType(click.ParamType):
         return sorted(chapter_dir_list)
 
 
+class JobsType(click.ParamType):
+    """
+    Количество процессов или auto. auto преобразуется в 0: количество
+    процессов выбирается по количеству CPU и времени выполнения тестов.
+    """
+
+    name = "N|auto"
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, int):
+            return value
+        if value == "auto":
+            return 0
+        if not value.isdigit() or int(value) < 1:
+            self.fail(red(f"Количество процессов должно быть числом или auto: {value}"))
+        return int(value)
+
+
+def manage_daemon(action):
+    if not daemon_supported():
+        print(red("Фоновый процесс apyneng не поддерживается в этой ОС"))
+    elif action == "start":
+        if start_daemon():
+            print(green("Фоновый процесс apyneng запущен"))
+        elif daemon_running():
+            print(green("Фоновый процесс apyneng уже запущен"))
+        else:
+            print(red("Не получилось запустить фоновый процесс apyneng"))
+    elif action == "stop":
+        if stop_daemon():
+            print(green("Фоновый процесс apyneng остановлен"))
+        else:
+            print(red("Фоновый процесс apyneng не запущен"))
+    elif daemon_running():
+        print(green("Фоновый процесс apyneng запущен"))
+    else:
+        print(red("Фоновый процесс apyneng не запущен"))
+
+
+def start_profiling(ctx, param, value):
+    """
+    callback для --profile. Опция обрабатывается раньше аргумента TASKS,
+    поэтому в профиль попадает и преобразование строки заданий.
+    """
+    if value:
+        enable_profiling()
+        ctx.call_on_close(finish_profiling)
+
+
 def print_docs_with_pager(width=90):
+    from rich.console import Console
+    from rich.markdown import Markdown
+
     console = Console(width=width)
     md = Markdown(DOCS)
     with console.pager():
@@ -170,6 +413,12 @@ def print_docs_with_pager(width=90):
 )
 @click.option("--docs", is_flag=True, help="Показать документацию apyneng")
 @click.option("--test-token", is_flag=True, help="Проверить работу токена")
+@click.option(
+    "--flush",
+    "flush_queue",
+    is_flag=True,
+    help="Отправить на GitHub задания, которые остались в очереди сдачи",
+)
 @click.option(
     "--save-all",
     "save_all_to_github",
@@ -187,10 +436,131 @@ def print_docs_with_pager(width=90):
     type=CustomChapterType(),
     help="Обновить все задания и тесты в указанных разделах",
 )
+@click.option(
+    "--chapters",
+    type=CustomChapterType(),
+    help="Запустить тесты всех заданий в указанных разделах (из каталога exercises)",
+)
 @click.option(
     "--disable-verbose", "-d", is_flag=True, help="Отключить подробный вывод pytest"
 )
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    type=JobsType(),
+    help=(
+        "Количество процессов для параллельного запуска тестов "
+        "(auto - по количеству CPU и времени выполнения тестов)"
+    ),
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Запускать тесты даже для заданий, которые не менялись после успешной проверки",
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    help="Запускать тесты заданий заново после каждого сохранения файлов",
+)
+@click.option(
+    "--stop-on-first-failing-task",
+    is_flag=True,
+    help="Остановить тесты после первого задания, которое не прошло тесты",
+)
+@click.option(
+    "--task-fail-fast/--no-task-fail-fast",
+    default=None,
+    help=(
+        "Пропускать остальные тесты задания после первого упавшего теста "
+        "(по умолчанию включено с -c)"
+    ),
+)
+@click.option(
+    "--timeout",
+    default=60,
+    type=click.FloatRange(min=0),
+    show_default=True,
+    help="Максимальное время выполнения одного теста в секундах (0 - без ограничения)",
+)
+@click.option(
+    "--session-timeout",
+    default=0,
+    type=click.FloatRange(min=0),
+    help="Максимальное время выполнения всех тестов в секундах",
+)
+@click.option(
+    "--max-cpu",
+    default=0,
+    type=click.IntRange(min=0),
+    help="Максимальное процессорное время одного теста в секундах",
+)
+@click.option(
+    "--max-memory",
+    default=0,
+    type=click.IntRange(min=0),
+    help="Максимальный размер памяти процесса с тестами в МБ",
+)
+@click.option(
+    "--history",
+    type=click.Choice(["slowest", "regressions", "time-to-green"]),
+    help=(
+        "Показать по истории запусков самые медленные тесты, задания, которые "
+        "перестали проходить тесты, или время до прохождения тестов"
+    ),
+)
+@click.option(
+    "--format",
+    "report_format",
+    type=click.Choice(["ndjson", "junit"]),
+    help="Записывать результат каждого теста в файл --output сразу после теста",
+)
+@click.option(
+    "--output",
+    "report_output",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Файл для результатов тестов в формате --format",
+)
+@click.option(
+    "--grade",
+    "grade_dir",
+    type=click.Path(exists=True, file_okay=False),
+    help="Проверить задания во всех репозиториях студентов в указанном каталоге",
+)
+@click.option(
+    "--grade-format",
+    type=click.Choice(["csv", "json", "ndjson"]),
+    default="csv",
+    show_default=True,
+    help="Формат результатов --grade",
+)
+@click.option(
+    "--grade-output",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Файл для результатов --grade (по умолчанию stdout)",
+)
+@click.option(
+    "--grade-timeout",
+    default=600,
+    type=click.FloatRange(min=1),
+    show_default=True,
+    help="Максимальное время проверки одного репозитория в секундах",
+)
+@click.option(
+    "--daemon",
+    type=click.Choice(["start", "stop", "status"]),
+    help="Управление фоновым процессом, который ускоряет запуск тестов",
+)
 @click.option("--debug", is_flag=True, help="Показывать traceback исключений")
+@click.option(
+    "--profile",
+    is_flag=True,
+    is_eager=True,
+    expose_value=False,
+    callback=start_profiling,
+    help="Записать время выполнения этапов работы apyneng в файл (Chrome trace)",
+)
 @click.option("--default-branch", "-b", default="main")
 @click.option(
     "--all",
@@ -204,15 +574,34 @@ def cli(
     tasks,
     disable_verbose,
     check,
+    jobs,
+    no_cache,
+    watch,
+    stop_on_first_failing_task,
+    task_fail_fast,
+    timeout,
+    session_timeout,
+    max_cpu,
+    max_memory,
+    history,
+    report_format,
+    report_output,
+    grade_dir,
+    grade_format,
+    grade_output,
+    grade_timeout,
+    daemon,
     debug,
     default_branch,
     test_token,
+    flush_queue,
     git_add_all_to_github,
     ignore_ssl_cert,
     update_tasks_tests,
     update_tests_only,
     save_all_to_github,
     update_chapters,
+    chapters,
     docs,
 ):
     """
@@ -222,11 +611,16 @@ def cli(
     Эти флаги не запускают тестирование заданий
      apyneng --docs                 Показать документацию apyneng
      apyneng --test-token           Проверить работу токена
+     apyneng --flush                Отправить задания из очереди сдачи (если не было доступа к GitHub)
      apyneng --save-all             Сохранить на GitHub все измененные файлы в текущем каталоге
      apyneng --update               Обновить все задания и тесты в текущем каталоге
      apyneng --update --test-only   Обновить только тесты в текущем каталоге
      apyneng 1,2 --update           Обновить задания 1 и 2 и соответствующие тесты в текущем каталоге
      apyneng --update-chapters 4-5  Обновить разделы 4 и 5 (каталоги будут удалены и скопированы обновленные версии)
+     apyneng --history slowest      Показать самые медленные тесты по истории запусков
+     apyneng --grade DIR            Проверить задания во всех репозиториях студентов в каталоге DIR
+     apyneng --daemon start         Запустить фоновый процесс, который ускоряет запуск тестов
+     apyneng --daemon stop          Остановить фоновый процесс
 
     \b
     Запуск тестирования заданий, просмотр ответов, сдача на проверку
@@ -235,6 +629,22 @@ def cli(
         apyneng 1,2a,5       запустить тесты для заданий 1, 2a и 5
         apyneng 1,2*         запустить тесты для заданий 1, все задания 2 с буквами и без
         apyneng 1,3-5        запустить тесты для заданий 1, 3, 4, 5
+        apyneng 4.1-9.3      запустить тесты для заданий с 4.1 по 9.3 из разных разделов
+        apyneng -j 4         запустить тесты в 4 процессах параллельно
+        apyneng 1-3 --watch  запускать тесты заданий 1-3 заново после каждого
+                             сохранения файлов этих заданий
+        apyneng --timeout 10 запустить тесты, каждый тест может выполняться
+                             не дольше 10 секунд
+        apyneng --format ndjson --output results.ndjson
+                             запустить тесты и записывать результат каждого
+                             теста в файл results.ndjson (формат junit - XML)
+        apyneng 1-5 --profile
+                             запустить тесты и показать, сколько времени
+                             заняли этапы работы apyneng
+        apyneng --chapters 1-18 -c
+                             запустить из каталога exercises тесты всех заданий
+                             разделов 1-18 и сдать на проверку задания,
+                             которые прошли тесты
         apyneng 1-5 -c       запустить тесты и сдать на проверку задания,
                              которые прошли тесты.
         apyneng 1-5 -c --all запустить тесты и сдать на проверку задания,
@@ -256,10 +666,57 @@ def cli(
         raise click.Abort()
 
     if test_token:
-        test_run_for_github_token()
+        test_run_for_github_token(
+            branch=DEFAULT_BRANCH, ignore_ssl_cert=ignore_ssl_cert
+        )
         print(green("Проверка токена прошла успешно"))
         raise click.Abort()
 
+    if daemon:
+        manage_daemon(daemon)
+        raise click.Abort()
+
+    if history:
+        from advpyneng_cli_course.history import print_history
+
+        print_history(history)
+        raise click.Abort()
+
+    if grade_dir:
+        from advpyneng_cli_course.grade import grade_repos
+
+        grade_repos(
+            grade_dir,
+            chapters=chapters,
+            output=grade_output,
+            output_format=grade_format,
+            jobs=jobs if jobs > 1 else None,
+            timeout=grade_timeout,
+            test_timeout=timeout,
+        )
+        raise click.Abort()
+
+    if flush_queue:
+        if not os.environ.get("GITHUB_TOKEN"):
+            raise AdvPynengError(token_error)
+        if not load_submissions():
+            print(green("Очередь сдачи заданий пуста"))
+            raise click.Abort()
+        sent = flush_submissions(ignore_ssl_cert=ignore_ssl_cert)
+        for repo, commit_sha in sent.items():
+            print(
+                green(
+                    f"Задания сданы на проверку: "
+                    f"https://github.com/pyneng/{repo}/commit/{commit_sha}"
+                )
+            )
+        raise click.Abort()
+
+    # задания, которые не удалось сдать раньше, отправляются при следующем
+    # запуске apyneng. С флагом -c очередь отправится после проверки заданий
+    if not check:
+        flush_pending_submissions(ignore_ssl_cert=ignore_ssl_cert)
+
     if save_all_to_github:
         save_changes_to_github(branch=DEFAULT_BRANCH)
         print(green("Все изменения в текущем каталоге сохранены на GitHub"))
@@ -272,16 +729,34 @@ def cli(
         update_chapters_tasks_and_tests(update_chapters, branch=DEFAULT_BRANCH)
         raise click.Abort()
 
-    # дальнейшее есть смысл выполнять только если мы находимся в каталоге
-    # конкретного раздела с заданиями
-    check_current_dir_name(
-        TASK_DIRS + DB_TASK_DIRS, "Проверку заданий можно выполнять только из каталогов"
-    )
+    if chapters:
+        check_current_dir_name(
+            ["exercises"], "Проверку нескольких разделов надо выполнять из каталога"
+        )
+        # пути к файлам указываются относительно каталога exercises
+        test_files, tasks_without_tests, task_files = get_chapters_tasks_tests(
+            chapters
+        )
+    else:
+        # дальнейшее есть смысл выполнять только если мы находимся в каталоге
+        # конкретного раздела с заданиями или в каталоге exercises,
+        # если задания указаны с номером раздела (apyneng 4.1-9.3)
+        if not (current_dir_name() == "exercises" and isinstance(tasks, tuple)):
+            check_current_dir_name(
+                TASK_DIRS + DB_TASK_DIRS,
+                "Проверку заданий можно выполнять только из каталогов",
+            )
+
+        # после обработки CustomTasksType, получаем три списка файлов
+        test_files, tasks_without_tests, task_files = tasks
 
-    # после обработки CustomTasksType, получаем три списка файлов
-    test_files, tasks_without_tests, task_files = tasks
+    # в списках есть файлы из других разделов, например, apyneng 1,8.1-9.3
+    cross_chapter = any(os.path.dirname(task_file) for task_file in task_files)
 
-    if update_tasks_tests:
+    if update_tasks_tests and not chapters:
+        if cross_chapter:
+            print(red("Обновлять можно только задания текущего раздела"))
+            raise click.Abort()
         if update_tests_only:
             tasks_files = None
             msg = green("Тесты успешно обновлены")
@@ -296,8 +771,37 @@ def cli(
     if not debug:
         sys.excepthook = exception_handler
 
-    json_plugin = JSONReport()
-    pytest_args_common = ["--json-report-file=none", "--disable-warnings"]
+    # ограничения для кода заданий, чтобы зависшее задание
+    # не блокировало проверку остальных заданий
+    # если модуль задания завершился с ошибкой или завис при импорте,
+    # тесты остальных заданий все равно запускаются
+    pytest_args_common = [
+        "--disable-warnings",
+        "--continue-on-collection-errors",
+        f"--apyneng-timeout={timeout}",
+        f"--apyneng-session-timeout={session_timeout}",
+        f"--apyneng-max-cpu={max_cpu}",
+        f"--apyneng-max-memory={max_memory}",
+    ]
+    if stop_on_first_failing_task:
+        pytest_args_common.append("--apyneng-stop-on-failed-task")
+    # с -c результат отдельных тестов не выводится, поэтому после первого
+    # упавшего теста нет смысла запускать остальные тесты задания
+    if task_fail_fast is None:
+        task_fail_fast = check
+    if task_fail_fast:
+        pytest_args_common.append("--apyneng-task-fail-fast")
+    # результаты тестов дописываются в файл сессиями pytest
+    # (в том числе в других процессах) по мере выполнения тестов
+    if report_format:
+        if not report_output:
+            print(red("Для флага --format надо указать файл --output"))
+            raise click.Abort()
+        report_output = os.path.abspath(report_output)
+        pytest_args_common += [
+            f"--apyneng-report-format={report_format}",
+            f"--apyneng-report-file={report_output}",
+        ]
 
     if disable_verbose:
         pytest_args = [*pytest_args_common, "--tb=short"]
@@ -309,26 +813,106 @@ def cli(
     if check:
         pytest_args = [*pytest_args_common, "--tb=no"]
 
-    # запуск pytest
-    pytest.main(test_files + pytest_args, plugins=[json_plugin])
-
-    # получить результаты pytest в формате JSON
-    # passed_tasks это задания у которых есть тесты и тесты прошли
-    passed_tasks = parse_json_report(json_plugin.report)
-
-    if passed_tasks or tasks_without_tests:
-        # сдать задания на проверку через github API
+    # в режиме --watch тесты запускаются заново после каждого изменения
+    # файлов, пока не будет нажато Ctrl+C
+    if watch:
         if check:
-            token = os.environ.get("GITHUB_TOKEN")
-            if not token:
-                raise AdvPynengError(token_error)
-            send_tasks_to_check(
-                passed_tasks + tasks_without_tests,
-                git_add_all=git_add_all_to_github,
-                ignore_ssl_cert=ignore_ssl_cert,
-                branch=DEFAULT_BRANCH
+            print(red("Флаг --watch нельзя использовать вместе с -c"))
+            raise click.Abort()
+        if report_format:
+            print(red("Флаг --watch нельзя использовать вместе с --format"))
+            raise click.Abort()
+        from advpyneng_cli_course.watch import watch_tests
+
+        watch_tests(test_files, pytest_args)
+        return
+
+    started = time.time()
+    if report_format:
+        from advpyneng_cli_course.report_stream import start_report
+
+        start_report(report_output, report_format)
+    # тесты заданий, которые уже прошли и с тех пор не менялись, не запускаются
+    tests_to_run, cached_tasks = test_files, []
+    if not no_cache:
+        with span("results cache"):
+            tests_to_run, cached_tasks = split_cached_tests(test_files)
+        if cached_tasks:
+            print(
+                green(
+                    "Задания и тесты не менялись после успешного запуска, "
+                    f"тесты не запускаются: {' '.join(cached_tasks)}"
+                )
             )
 
+    # задания, которые не прошли тесты в прошлый раз или изменились,
+    # запускаются первыми
+    with span("results cache"):
+        tests_to_run = schedule_test_files(tests_to_run)
+        durations = recorded_durations(tests_to_run)
+
+    # запуск pytest, при jobs > 1 файлы тестов распределяются по процессам
+    # с учетом времени выполнения тестов каждого файла при прошлом запуске
+    # passed_tasks это задания у которых есть тесты и тесты прошли
+    results = {"tasks": {}, "tests": {}}
+    if tests_to_run or not cached_tasks:
+        # pytest импортируется только если надо запускать тесты
+        from advpyneng_cli_course.runner import run_tests, run_chapters_tests
+
+        with span("pytest", jobs=jobs):
+            if chapters or cross_chapter:
+                results = run_chapters_tests(
+                    tests_to_run,
+                    pytest_args,
+                    jobs=jobs,
+                    stop_on_failed_task=stop_on_first_failing_task,
+                    durations=durations,
+                )
+            else:
+                results = run_tests(
+                    tests_to_run, pytest_args, jobs=jobs, durations=durations
+                )
+        with span("results cache"):
+            update_results_cache(results["tasks"], results["tests"])
+    if report_format:
+        from advpyneng_cli_course.report_stream import finish_report
+
+        # задания, пропущенные по кэшу, уже прошли тесты
+        finish_report(
+            report_output,
+            report_format,
+            {**results["tasks"], **dict.fromkeys(cached_tasks, True)},
+        )
+    passed_tasks = [test_file for test_file, ok in results["tasks"].items() if ok]
+    passed_tasks = sorted(passed_tasks + cached_tasks)
+    if chapters:
+        print_chapters_summary(chapters, test_files, passed_tasks)
+
+    submitted_tasks = []
+    try:
+        if passed_tasks or tasks_without_tests:
+            # сдать задания на проверку через github API
+            if check:
+                token = os.environ.get("GITHUB_TOKEN")
+                if not token:
+                    raise AdvPynengError(token_error)
+                with span("send tasks to check"):
+                    sent = send_tasks_to_check(
+                        passed_tasks + tasks_without_tests,
+                        git_add_all=git_add_all_to_github,
+                        ignore_ssl_cert=ignore_ssl_cert,
+                        branch=DEFAULT_BRANCH,
+                    )
+                # если GitHub недоступен, задания только добавлены в очередь
+                if sent:
+                    submitted_tasks = passed_tasks
+    finally:
+        # результаты записываются в историю и если сдать задания не получилось
+        from advpyneng_cli_course.history import record_run
+
+        with span("history"):
+            record_run(results, cached_tasks, submitted_tasks, started, check)
+
     # если добавлен флаг --all, надо сохранить все изменения на github
     if git_add_all_to_github:
         save_changes_to_github(branch=DEFAULT_BRANCH)
@@ -62,6 +62,136 @@ apyneng 2a-b
 apyneng 2*
 ```
 
+Задания других разделов указываются с номером раздела. Например,
+так запустятся тесты для задания 1 текущего раздела и для всех заданий с 8.1 по 9.3
+(из каталога exercises можно указывать только задания с номером раздела):
+
+```
+apyneng 1,8.1-9.3
+```
+
+Тесты можно запускать параллельно в нескольких процессах. Например, так
+тесты всех заданий раздела будут распределены по 4 процессам:
+
+```
+apyneng -j 4
+```
+
+apyneng запоминает, сколько времени выполнялись тесты каждого задания,
+и распределяет файлы тестов по процессам так, чтобы процессы работали
+примерно одинаковое время: сначала самые долгие тесты. С ``-j auto``
+количество процессов выбирается по количеству CPU и времени выполнения
+тестов (если тесты выполняются быстро, они запускаются в одном процессе):
+
+```
+apyneng -j auto
+```
+
+Из каталога exercises можно запустить тесты сразу для нескольких разделов.
+Разделы проверяются одновременно, в конце выводится общий итог по разделам.
+С флагом ``-c`` задания всех разделов, которые прошли тесты, сдаются одним коммитом:
+
+```
+apyneng --chapters 1-18
+apyneng --chapters 12,14 -c
+```
+
+apyneng запоминает результаты тестов в каталоге ~/.advpyneng-cache.
+Если задание уже прошло тесты и с тех пор не менялись ни файл задания,
+ни файл тестов, тесты этого задания повторно не запускаются, но задание
+считается прошедшим тесты (в том числе при сдаче с ``-c``).
+Запустить все тесты заново:
+
+```
+apyneng --no-cache
+```
+
+Байткод модулей заданий и тестов apyneng тоже сохраняет в каталоге
+~/.advpyneng-cache, поэтому в каталогах заданий не создаются __pycache__
+и .pytest_cache.
+
+Задания, которые не прошли тесты при прошлом запуске, а также задания,
+которые изменились после прошлого запуска, проверяются первыми.
+Остановить проверку после первого задания, которое не прошло тесты:
+
+```
+apyneng --stop-on-first-failing-task
+```
+
+Задания, которые прошли тесты до остановки, сдаются на проверку с ``-c``
+как обычно.
+
+При сдаче заданий с ``-c`` после первого упавшего теста задания остальные тесты
+этого задания не запускаются (задание все равно не пройдено), тесты других
+заданий выполняются как обычно. Это поведение можно включить и без ``-c``
+(``--task-fail-fast``) или отключить (``--no-task-fail-fast``).
+
+Чтобы задание с бесконечным циклом или event loop, который не завершается,
+не блокировало проверку, время выполнения каждого теста ограничено
+60 секундами. Тест, который выполняется дольше, считается не прошедшим.
+Ограничение можно изменить (0 - без ограничения), а также ограничить время
+всех тестов, процессорное время одного теста и память процесса с тестами
+(работает в Linux и macOS):
+
+```
+apyneng --timeout 10
+apyneng --session-timeout 300 --max-cpu 20 --max-memory 1024
+```
+
+В Linux и macOS можно запустить фоновый процесс apyneng, который заранее
+загружает pytest и остальные модули. Пока он запущен, apyneng передает
+ему запуск тестов и выводит результат, поэтому проверка одного задания
+выполняется быстрее. Каждый запуск тестов выполняется в отдельном процессе.
+
+```
+apyneng --daemon start
+apyneng --daemon status
+apyneng --daemon stop
+```
+
+Чтобы не запускать apyneng вручную после каждого изменения, можно включить
+режим ``--watch``. apyneng запускает тесты, а затем после каждого сохранения
+файлов раздела запускает заново только тесты тех заданий, файлы которых
+изменились (при изменении вспомогательных файлов раздела, например,
+conftest.py, запускаются все выбранные тесты). Задания указываются так же,
+как при обычном запуске. Для завершения нажмите Ctrl+C.
+
+```
+apyneng 1-3 --watch
+```
+
+Если apyneng работает медленно, можно посмотреть, на какие этапы уходит время
+(поиск заданий, pytest, вызовы git, запросы к GitHub). С флагом ``--profile``
+apyneng выводит таблицу с суммарным временем этапов и записывает профиль
+в JSON файл, который можно открыть в chrome://tracing или https://ui.perfetto.dev:
+
+```
+apyneng 1-3 --profile
+```
+
+apyneng сохраняет историю запусков тестов (результат и время выполнения каждого
+теста, сданы ли задания на проверку) в файле ~/.advpyneng-cache/history.sqlite3.
+По истории можно посмотреть самые медленные тесты, задания, которые раньше
+проходили тесты, а при последнем запуске нет, и сколько времени и запусков
+понадобилось, чтобы задания прошли тесты:
+
+```
+apyneng --history slowest
+apyneng --history regressions
+apyneng --history time-to-green
+```
+
+Результаты тестов можно записывать в файл в формате NDJSON (одна JSON запись
+на строку) или JUnit XML. Результат каждого теста дописывается в файл сразу
+после завершения теста, поэтому файл можно читать во время работы apyneng
+(например, tail -f). Последняя запись - итог по заданиям (задание прошло
+тесты, если прошли все тесты задания):
+
+```
+apyneng --format ndjson --output results.ndjson
+apyneng 1-5 --format junit --output results.xml
+```
+
 
 ## Сдача заданий на проверку
 
@@ -87,6 +217,18 @@ apyneng -c
 При добавлении ``-c`` apyneng делает git add файлам заданий, которые прошли тесты, делает commit,
 и git push. После этого пишет комментарий на github, что задания такие-то сданы на проверку.
 
+Если GitHub недоступен (например, нет доступа в интернет), коммит с заданиями
+остается в локальном репозитории, а сдача заданий записывается в очередь.
+apyneng несколько раз повторяет попытку, увеличивая паузу между попытками.
+Задания из очереди отправляются при следующем запуске apyneng или командой:
+
+```
+apyneng --flush
+```
+
+Если в очереди несколько сдач, выполняется один git push и пишется один
+комментарий со всеми заданиями к последнему коммиту.
+
 Запустить тесты и сдать на проверку задания,
 которые прошли тесты, но при этом загрузить на github все изменения
 в текущем каталоге:
@@ -111,8 +253,8 @@ git push origin main
 ## Обновление разделов
 
 В apyneng есть два варианта обновления: обновлять разделами или конкретные
-задания/тесты.  При обновлении раздела, каталог раздела удаляется и копируется
-новая версия. Это подходит только для тех разделов, которые вы еще не начинали
+задания/тесты.  При обновлении раздела, каталог раздела заменяется новой версией:
+измененные файлы перезаписываются, а файлы, которых нет в новой версии, удаляются. Это подходит только для тех разделов, которые вы еще не начинали
 выполнять. Если надо обновить конкретное задание, лучше использовать обновление
 конкретных заданий (рассматривается дальше).
 
@@ -146,6 +288,8 @@ apyneng добавлена опция ``--update``.
 Общая логика:
 
 * задания и тесты копируются из репозитория https://github.com/pyneng/advpyneng-course-tasks
+* локальная копия репозитория хранится в ~/.advpyneng-course-tasks, в ней есть только
+  последний коммит и только те разделы, которые обновлялись
 * копируется весь файл задания, не только описание, поэтому файл перепишется
 * перед выполнением --update, лучше созранить все изменения на github
 
@@ -154,6 +298,7 @@ apyneng добавлена опция ``--update``.
 * если в репозитории есть несохраненные изменения
   * утилита предлагает их сохранить (сделает ``git add .``, ``git commit``, ``git push``)
 * если несохраненных изменений нет, копируются указанные задания и тесты
+* копируются только те файлы, которые отличаются от локальных
 * утилита предлагает сохранить изменения и показывает какие файлы изменены, но не какие именно сделаны изменения
 * можно отказаться сохранять изменения и посмотреть изменения git diff
 
@@ -181,9 +326,6 @@ apyneng 1,2 --update
 
 ```
 $ apyneng --update
-#################### git pull
-Already up-to-date.
-
 
 Обновленные задания и тесты скопированы
 Задания и тесты уже последней версии
@@ -207,19 +349,13 @@ To git@github.com:pyneng/advpyneng-14-natasha-samoylenko.git
    fa338c3..0e8c1cb  main -> main
 
 Все изменения в текущем каталоге сохранены. Начинаем обновление...
-#################### git pull
-Already up-to-date.
-
 
 Обновленные задания и тесты скопированы
 Были обновлены такие файлы:
-#################### git diff --stat
- exercises/14_generators/task_14_1.py |  1 -
- exercises/14_generators/task_14_3.py |  3 ---
- 3 files changed, 0 insertions(+), 4 deletions(-)
-
+    изменен   task_14_1.py
+    изменен   task_14_3.py
 
-Это короткий diff, если вы хотите посмотреть все отличия подробно, нажмите n и дайте команду git diff.
+Если вы хотите посмотреть все отличия подробно, нажмите n и дайте команду git diff.
 Также при желании можно отменить внесенные изменения git checkout -- file (или git restore file).
 
 Сохранить изменения и добавить на github? [y/n]: n
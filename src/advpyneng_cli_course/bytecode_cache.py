@@ -0,0 +1,90 @@
+import os
+import sys
+import types
+import marshal
+import hashlib
+import tempfile
+import importlib.util
+
+from advpyneng_cli_course.cache import RESULTS_CACHE_DIR, _pytest_version
+
+
+# байткод модулей заданий и тестов (вместо __pycache__ в каталогах заданий)
+PYCACHE_DIR = RESULTS_CACHE_DIR / "pycache"
+# байткод тестов после перезаписи assert pytest, имя файла - хеш содержимого
+REWRITTEN_TESTS_DIR = RESULTS_CACHE_DIR / "rewritten-tests"
+
+
+def enable_shared_bytecode_cache():
+    """
+    Функция включает общий для всех запусков apyneng кэш байткода вне
+    каталога заданий, поэтому в git status не появляются __pycache__.
+
+    Байткод тестов после перезаписи assert pytest сохраняется по хешу
+    содержимого файла тестов, поэтому одинаковые файлы тестов в разных
+    каталогах (например, в репозиториях разных студентов при --grade)
+    перезаписываются и компилируются один раз.
+    """
+    if not sys.pycache_prefix:
+        sys.pycache_prefix = str(PYCACHE_DIR)
+    from _pytest.assertion import rewrite
+
+    rewrite_test = getattr(rewrite, "_rewrite_test", None)
+    if rewrite_test is None or getattr(rewrite_test, "apyneng_cached", False):
+        return
+
+    def cached_rewrite_test(fn, config):
+        try:
+            source = fn.read_bytes()
+        except OSError:
+            return rewrite_test(fn, config)
+        pyc = REWRITTEN_TESTS_DIR / f"{_rewrite_key(source, config)}.pyc"
+        try:
+            co = marshal.loads(pyc.read_bytes())
+            return fn.stat(), _with_filename(co, str(fn))
+        except (OSError, ValueError, EOFError, TypeError):
+            pass
+        source_stat, co = rewrite_test(fn, config)
+        _write_atomic(pyc, marshal.dumps(co))
+        return source_stat, co
+
+    cached_rewrite_test.apyneng_cached = True
+    rewrite._rewrite_test = cached_rewrite_test
+
+
+def _rewrite_key(source, config):
+    key = hashlib.sha256()
+    for part in (
+        importlib.util.MAGIC_NUMBER,
+        _pytest_version().encode(),
+        str(config.getini("enable_assertion_pass_hook")).encode(),
+        source,
+    ):
+        key.update(part)
+        key.update(b"\0")
+    return key.hexdigest()
+
+
+def _with_filename(co, filename):
+    """
+    Байткод из кэша мог быть получен из файла в другом каталоге,
+    поэтому в traceback должен быть путь к текущему файлу тестов
+    """
+    consts = tuple(
+        _with_filename(const, filename) if isinstance(const, types.CodeType) else const
+        for const in co.co_consts
+    )
+    return co.replace(co_filename=filename, co_consts=consts)
+
+
+def _write_atomic(path, data):
+    # файл записывается во временный файл и переименовывается, поэтому
+    # параллельные запуски apyneng не читают файл, записанный наполовину
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_name, path)
+    except OSError:
+        pass
@@ -0,0 +1,152 @@
+import os
+import sys
+import json
+import hashlib
+import pathlib
+import tempfile
+from functools import lru_cache
+from collections import defaultdict
+
+
+RESULTS_CACHE_DIR = pathlib.Path.home() / ".advpyneng-cache"
+RESULTS_CACHE_FILE = RESULTS_CACHE_DIR / "results.json"
+
+
+def _file_hash(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return ""
+
+
+@lru_cache(maxsize=None)
+def _pytest_version():
+    from importlib import metadata
+
+    return metadata.version("pytest")
+
+
+def task_cache_key(test_file):
+    """
+    Функция возвращает ключ кэша для файла тестов: хеш от содержимого
+    файла задания, файла тестов, conftest.py раздела, а также версий
+    Python и pytest.
+    """
+    chapter_dir, test_name = os.path.split(test_file)
+    task_file = os.path.join(chapter_dir, test_name.replace("test_", "", 1))
+    conftest_file = os.path.join(chapter_dir, "conftest.py")
+    key = hashlib.sha256()
+    for part in (
+        sys.version,
+        _pytest_version(),
+        _file_hash(task_file),
+        _file_hash(test_file),
+        _file_hash(conftest_file),
+    ):
+        key.update(part.encode("utf-8"))
+        key.update(b"\0")
+    return key.hexdigest()
+
+
+def load_results_cache():
+    try:
+        with open(RESULTS_CACHE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_results_cache(cache):
+    """
+    Кэш записывается во временный файл, который затем переименовывается,
+    поэтому одновременные запуски apyneng не могут испортить файл кэша.
+    """
+    RESULTS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=RESULTS_CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp_name, RESULTS_CACHE_FILE)
+
+
+def split_cached_tests(test_files):
+    """
+    Функция разделяет файлы тестов на те, которые надо запустить, и те,
+    которые уже прошли и с тех пор не менялись ни задание, ни тест.
+    Возвращает кортеж (тесты для запуска, тесты которые прошли по данным кэша).
+    """
+    cache = load_results_cache()
+    tests_to_run = []
+    cached_passed = []
+    for test_file in test_files:
+        cached = cache.get(os.path.abspath(test_file))
+        if (
+            cached
+            and cached["outcome"] == "passed"
+            and cached["key"] == task_cache_key(test_file)
+        ):
+            cached_passed.append(test_file)
+        else:
+            tests_to_run.append(test_file)
+    return tests_to_run, cached_passed
+
+
+def update_results_cache(task_outcomes, tests=None):
+    """
+    Функция записывает в кэш результаты запуска тестов task_outcomes
+    (словарь {файл тестов: прошли ли тесты}) и время выполнения тестов
+    каждого файла по результатам отдельных тестов tests
+    (словарь {nodeid: [outcome, время выполнения]}). Файлы, тесты которых
+    не запускались (например, после --stop-on-first-failing-task),
+    в кэше не меняются.
+    """
+    if not task_outcomes:
+        return
+    durations = defaultdict(float)
+    for nodeid, (outcome, duration) in (tests or {}).items():
+        durations[nodeid.split("::")[0]] += duration
+    cache = load_results_cache()
+    for test_file, passed in task_outcomes.items():
+        path = os.path.abspath(test_file)
+        entry = {
+            "key": task_cache_key(test_file),
+            "outcome": "passed" if passed else "failed",
+        }
+        if test_file in durations:
+            entry["duration"] = round(durations[test_file], 6)
+        elif "duration" in cache.get(path, {}):
+            entry["duration"] = cache[path]["duration"]
+        cache[path] = entry
+    save_results_cache(cache)
+
+
+def recorded_durations(test_files):
+    """
+    Функция возвращает словарь {файл тестов: время выполнения тестов файла
+    при последнем запуске в секундах или None, если тесты еще не запускались}.
+    """
+    cache = load_results_cache()
+    return {
+        test_file: cache.get(os.path.abspath(test_file), {}).get("duration")
+        for test_file in test_files
+    }
+
+
+def schedule_test_files(test_files):
+    """
+    Функция возвращает файлы тестов в порядке запуска: сначала задания,
+    которые не прошли тесты при прошлом запуске, затем задания, которые
+    изменились после прошлого запуска или еще не запускались, затем остальные.
+    Внутри каждой группы сохраняется исходный порядок.
+    """
+    cache = load_results_cache()
+
+    def priority(test_file):
+        cached = cache.get(os.path.abspath(test_file))
+        if cached is None:
+            return (True, False)
+        failed = cached["outcome"] != "passed"
+        changed = cached["key"] != task_cache_key(test_file)
+        return (not failed, not changed)
+
+    return sorted(test_files, key=priority)
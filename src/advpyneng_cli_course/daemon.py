@@ -0,0 +1,213 @@
+"""
+Фоновый процесс apyneng, который заранее загружает click, pytest, rich,
+requests и плагины pytest и принимает запросы на запуск тестов через
+unix socket. Каждая сессия pytest запускается в отдельном дочернем процессе
+(fork), поэтому модули заданий не сохраняются между запусками.
+
+Запуск и остановка:
+
+    apyneng --daemon start
+    apyneng --daemon stop
+"""
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import subprocess
+
+from advpyneng_cli_course.cache import RESULTS_CACHE_DIR
+
+
+SOCKET_PATH = RESULTS_CACHE_DIR / "apyneng.sock"
+RESULT_MARKER = b"\0APYNENG-RESULT "
+
+
+def daemon_supported():
+    return hasattr(socket, "AF_UNIX") and hasattr(os, "fork")
+
+
+def _connect():
+    """
+    Возвращает сокет подключенный к фоновому процессу
+    или None, если процесс не запущен.
+    """
+    if not daemon_supported() or not SOCKET_PATH.exists():
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(str(SOCKET_PATH))
+    except OSError:
+        client.close()
+        return None
+    return client
+
+
+def _send_request(client, request):
+    client.sendall(json.dumps(request).encode("utf-8") + b"\n")
+
+
+def daemon_running():
+    client = _connect()
+    if client is None:
+        return False
+    with client:
+        _send_request(client, {"command": "ping"})
+        return client.recv(16) == b"pong"
+
+
+def start_daemon(timeout=10):
+    """
+    Запускает фоновый процесс и ждет, пока он начнет принимать подключения.
+    Возвращает False, если процесс уже был запущен.
+    """
+    if daemon_running():
+        return False
+    subprocess.Popen(
+        [sys.executable, "-m", "advpyneng_cli_course.daemon"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if daemon_running():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def stop_daemon():
+    client = _connect()
+    if client is None:
+        return False
+    with client:
+        _send_request(client, {"command": "stop"})
+        client.recv(16)
+    return True
+
+
+def run_tests_in_daemon(test_files, pytest_args):
+    """
+    Передает файлы тестов фоновому процессу и выводит вывод pytest
+    по мере его получения. Возвращает результаты (как OutcomeCollector.results())
+    или None, если фоновый процесс не запущен.
+    """
+    client = _connect()
+    if client is None:
+        return None
+    if sys.stdout.isatty():
+        pytest_args = [*pytest_args, "--color=yes"]
+    request = {
+        "command": "run",
+        "cwd": os.getcwd(),
+        "env": dict(os.environ),
+        "test_files": list(test_files),
+        "pytest_args": list(pytest_args),
+    }
+    output = sys.stdout.buffer
+    buffer = b""
+    result = None
+    with client:
+        _send_request(client, request)
+        while True:
+            data = client.recv(65536)
+            if not data:
+                break
+            buffer += data
+            if result is None:
+                marker_index = buffer.find(RESULT_MARKER)
+                if marker_index == -1:
+                    # конец буфера может быть началом маркера
+                    keep = len(RESULT_MARKER) - 1
+                    output.write(buffer[:-keep])
+                    buffer = buffer[-keep:]
+                else:
+                    output.write(buffer[:marker_index])
+                    buffer = buffer[marker_index + len(RESULT_MARKER) :]
+                    result = True
+                output.flush()
+    if result is None:
+        output.write(buffer)
+        output.flush()
+        return {"tasks": {}, "tests": {}}
+    return json.loads(buffer.decode("utf-8"))
+
+
+def _run_request(conn, request):
+    """
+    Выполняется в дочернем процессе: stdout и stderr перенаправляются в сокет,
+    после вывода pytest отправляется маркер и результат в JSON.
+    """
+    from advpyneng_cli_course.runner import run_pytest_session
+
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+    os.dup2(conn.fileno(), 1)
+    os.dup2(conn.fileno(), 2)
+    sys.stdout.reconfigure(line_buffering=True)
+    sys.stderr.reconfigure(line_buffering=True)
+    try:
+        output, results = run_pytest_session(
+            request["test_files"], request["pytest_args"]
+        )
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    conn.sendall(RESULT_MARKER + json.dumps(results).encode("utf-8"))
+
+
+def preload_modules():
+    import click
+    import pytest
+    import requests
+    import rich.console
+    import rich.markdown
+    # модули pytest_clarity не загружаются заранее: pytest переписывает
+    # assert в модулях плагинов при загрузке и иначе выводит предупреждение.
+    # Основное время загрузки pytest_clarity это rich.console
+    import advpyneng_cli_course.apyneng
+    import advpyneng_cli_course.runner
+
+
+def serve():
+    preload_modules()
+    RESULTS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    if SOCKET_PATH.exists():
+        SOCKET_PATH.unlink()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(SOCKET_PATH))
+    os.chmod(SOCKET_PATH, 0o600)
+    server.listen()
+    # завершившиеся дочерние процессы удаляются автоматически
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                request = json.loads(conn.makefile("rb").readline())
+                command = request.get("command")
+                if command == "ping":
+                    conn.sendall(b"pong")
+                elif command == "stop":
+                    conn.sendall(b"stopped")
+                    break
+                elif command == "run":
+                    if os.fork() == 0:
+                        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                        server.close()
+                        try:
+                            _run_request(conn, request)
+                        finally:
+                            os._exit(0)
+    finally:
+        server.close()
+        if SOCKET_PATH.exists():
+            SOCKET_PATH.unlink()
+
+
+if __name__ == "__main__":
+    serve()
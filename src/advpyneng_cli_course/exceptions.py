@@ -4,3 +4,15 @@ class AdvPynengError(Exception):
     """
 
 
+class GithubConnectionError(AdvPynengError):
+    """
+    Временная ошибка при обращении к GitHub (нет сети, таймаут, ошибка 5xx),
+    после которой запрос можно повторить
+    """
+
+
+class GitPushRejectedError(AdvPynengError):
+    """
+    git push завершился с ошибкой, которая не связана с сетью (например,
+    non-fast-forward или нет прав), повторная попытка не поможет
+    """
@@ -0,0 +1,229 @@
+"""
+Плагин pytest с фейковыми сетевыми устройствами для тестов разделов
+про asyncio. Устройства работают как telnet сервер на localhost и на
+каждую команду возвращают заранее записанный вывод, поэтому тестам
+не нужны настоящие устройства и сеть.
+
+Устройства описываются в файле fake_devices.yaml в каталоге раздела:
+
+    R1:
+      username: cisco
+      password: cisco
+      secret: cisco
+      commands:
+        sh clock: |
+          *17:34:58.133 UTC Wed Oct 14 2026
+
+Фикстура fake_devices возвращает словарь с параметрами подключения
+к устройствам из fake_devices.yaml рядом с файлом тестов:
+{"R1": {"host": "127.0.0.1", "port": 40123, "username": "cisco", ...}}.
+Серверы устройств запускаются один раз за сессию pytest в отдельном
+потоке со своим циклом событий и используются всеми тестами, поэтому
+к ним можно подключаться и из синхронного кода, и из asyncio.
+"""
+import asyncio
+import threading
+from pathlib import Path
+
+import pytest
+
+
+FAKE_DEVICES_FILE = "fake_devices.yaml"
+INVALID_INPUT = "% Invalid input detected at '^' marker."
+
+# команды telnet (IAC ...), которые отправляют клиенты при подключении
+IAC, SB, SE = 255, 250, 240
+IAC_OPTIONS = range(251, 255)
+
+
+def load_fake_devices(path):
+    import yaml
+
+    with open(path, encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def strip_telnet_commands(data):
+    """
+    Функция удаляет из данных от клиента команды согласования
+    параметров telnet и символы \\0
+    """
+    result = bytearray()
+    index = 0
+    while index < len(data):
+        byte = data[index]
+        if byte != IAC:
+            if byte:
+                result.append(byte)
+            index += 1
+        elif index + 1 < len(data) and data[index + 1] == SB:
+            end = data.find(bytes([IAC, SE]), index)
+            index = len(data) if end == -1 else end + 2
+        elif index + 1 < len(data) and data[index + 1] in IAC_OPTIONS:
+            index += 3
+        else:
+            index += 2
+    return bytes(result)
+
+
+class FakeDevice:
+    """
+    Одно фейковое устройство: вход по логину и паролю (если они заданы),
+    режим enable (если задан secret) и вывод команд из params["commands"].
+    """
+
+    def __init__(self, name, params):
+        self.name = name
+        self.hostname = params.get("hostname", name)
+        self.username = params.get("username")
+        self.password = params.get("password")
+        self.secret = params.get("secret")
+        self.commands = {
+            self.normalize(command): str(output)
+            for command, output in (params.get("commands") or {}).items()
+        }
+
+    @staticmethod
+    def normalize(command):
+        return " ".join(command.split())
+
+    def prompt(self, enabled):
+        return f"{self.hostname}{'#' if enabled else '>'}"
+
+    def output(self, command):
+        command = self.normalize(command)
+        if command in self.commands:
+            return self.commands[command]
+        if not command or command.startswith("terminal "):
+            return ""
+        return INVALID_INPUT
+
+    async def handle(self, reader, writer):
+        lines = _read_lines(reader)
+        try:
+            if self.username is not None:
+                writer.write(b"\r\nUser Access Verification\r\n\r\nUsername: ")
+                username = await lines.__anext__()
+                writer.write(b"Password: ")
+                password = await lines.__anext__()
+                if (username, password) != (self.username, self.password):
+                    writer.write(b"% Authentication failed\r\n")
+                    return
+            enabled = self.secret is None
+            writer.write(f"\r\n{self.prompt(enabled)}".encode())
+            async for line in lines:
+                command = self.normalize(line)
+                if command in ("exit", "quit", "logout"):
+                    return
+                if len(command) > 1 and "enable".startswith(command) and not enabled:
+                    writer.write(b"Password: ")
+                    enabled = await lines.__anext__() == self.secret
+                    output = "" if enabled else "% Access denied"
+                elif command == "disable" and self.secret is not None:
+                    enabled, output = False, ""
+                else:
+                    output = self.output(command)
+                output = output.rstrip("\n").replace("\n", "\r\n")
+                if output:
+                    output += "\r\n"
+                writer.write(f"{output}{self.prompt(enabled)}".encode())
+                await writer.drain()
+        except (StopAsyncIteration, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _read_lines(reader):
+    buffer = ""
+    while True:
+        data = await reader.read(1024)
+        if not data:
+            return
+        buffer += strip_telnet_commands(data).decode(errors="replace")
+        buffer = buffer.replace("\r\n", "\n").replace("\r", "\n")
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line
+
+
+class FakeDevicePool:
+    """
+    Серверы фейковых устройств в отдельном потоке с циклом событий asyncio.
+    Серверы для каждого файла fake_devices.yaml запускаются один раз.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.servers = []
+        self.devices = {}
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Возвращает параметры подключения к устройствам из файла path
+        """
+        path = Path(path).resolve()
+        with self.lock:
+            if path not in self.devices:
+                if self.loop is None:
+                    self._start_loop()
+                future = asyncio.run_coroutine_threadsafe(
+                    self._start_servers(load_fake_devices(path)), self.loop
+                )
+                self.devices[path] = future.result(timeout=10)
+        return {name: dict(params) for name, params in self.devices[path].items()}
+
+    def _start_loop(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="apyneng-fake-devices", daemon=True
+        )
+        self.thread.start()
+
+    async def _start_servers(self, devices):
+        connection_params = {}
+        for name, params in devices.items():
+            device = FakeDevice(name, params or {})
+            server = await asyncio.start_server(device.handle, "127.0.0.1", 0)
+            self.servers.append(server)
+            connection_params[name] = {
+                "host": "127.0.0.1",
+                "port": server.sockets[0].getsockname()[1],
+                "username": device.username,
+                "password": device.password,
+                "secret": device.secret,
+            }
+        return connection_params
+
+    async def _stop_servers(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+
+    def close(self):
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._stop_servers(), self.loop).result(
+            timeout=10
+        )
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.loop = None
+
+
+@pytest.fixture(scope="session")
+def fake_device_pool():
+    pool = FakeDevicePool()
+    yield pool
+    pool.close()
+
+
+@pytest.fixture(scope="module")
+def fake_devices(request, fake_device_pool):
+    path = request.path.parent / FAKE_DEVICES_FILE
+    if not path.exists():
+        pytest.fail(f"Не найден файл с фейковыми устройствами {path}")
+    return fake_device_pool.get(path)
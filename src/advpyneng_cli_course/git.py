@@ -0,0 +1,130 @@
+import os
+import shlex
+import subprocess
+from collections import namedtuple
+
+from advpyneng_cli_course.profiling import span
+
+
+GitResult = namedtuple("GitResult", ["command", "returncode", "stdout", "stderr"])
+
+
+def run_git(*args, capture_output=True):
+    """
+    Функция вызывает git с аргументами args без shell и возвращает GitResult.
+    Если capture_output=False, вывод git не перехватывается (например,
+    чтобы git push мог запросить логин и пароль).
+    """
+    command = ["git", *args]
+    command_line = shlex.join(command)
+    with span(command_line):
+        if capture_output:
+            result = subprocess.run(
+                command,
+                encoding="utf-8",
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        else:
+            result = subprocess.run(command)
+    return GitResult(
+        command_line, result.returncode, result.stdout or "", result.stderr or ""
+    )
+
+
+def print_git_result(result):
+    print("#" * 20, result.command)
+    if result.stdout:
+        print(result.stdout)
+    if result.stderr:
+        print(result.stderr)
+
+
+def git_status():
+    """
+    Функция возвращает список измененных файлов в формате git status --porcelain.
+    Результат можно переиспользовать, пока файлы в репозитории не менялись.
+    """
+    return run_git("status", "--porcelain").stdout.splitlines()
+
+
+def git_add(paths):
+    """
+    Функция добавляет все файлы paths одним вызовом git add
+    """
+    if not paths:
+        return None
+    return run_git("add", "--", *paths)
+
+
+def git_commit(message):
+    return run_git("commit", "-m", message)
+
+
+def git_push(branch, capture_output=True, repo_dir=None):
+    repo_args = ("-C", repo_dir) if repo_dir else ()
+    return run_git(
+        *repo_args, "push", "origin", branch, capture_output=capture_output
+    )
+
+
+def git_remote_urls():
+    return run_git("remote", "-v").stdout
+
+
+def is_git_repo(path):
+    if not os.path.isdir(path):
+        return False
+    return run_git("-C", path, "rev-parse", "--git-dir").returncode == 0
+
+
+def git_toplevel():
+    """
+    Функция возвращает корневой каталог текущего репозитория
+    """
+    return run_git("rev-parse", "--show-toplevel").stdout.strip()
+
+
+def git_rev_parse(ref):
+    """
+    Функция возвращает хеш коммита ref или пустую строку, если ref не найден
+    """
+    result = run_git("rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}")
+    return result.stdout.strip()
+
+
+def git_sparse_clone(repo_url, repo_dir, paths):
+    """
+    Функция клонирует только последний коммит репозитория repo_url без
+    содержимого файлов (blobless) и загружает файлы только из каталогов paths.
+    Возвращает GitResult первой команды с ошибкой или последней команды.
+    """
+    result = run_git(
+        "clone", "--depth", "1", "--filter=blob:none", "--sparse", repo_url, repo_dir
+    )
+    if result.returncode == 0:
+        result = run_git("-C", repo_dir, "sparse-checkout", "add", *paths)
+    return result
+
+
+def git_sparse_update(repo_dir, paths):
+    """
+    Функция добавляет каталоги paths в sparse checkout репозитория repo_dir,
+    если их там еще нет, и загружает только изменения с последнего обновления.
+    Возвращает GitResult первой команды с ошибкой или последней команды.
+    """
+    sparse_list = run_git("-C", repo_dir, "sparse-checkout", "list")
+    if sparse_list.returncode != 0:
+        return sparse_list
+    new_paths = sorted(set(paths) - set(sparse_list.stdout.splitlines()))
+    commands = [
+        ("fetch", "--depth", "1", "origin"),
+        ("reset", "--hard", "FETCH_HEAD"),
+    ]
+    if new_paths:
+        commands.append(("sparse-checkout", "add", *new_paths))
+    for command in commands:
+        result = run_git("-C", repo_dir, *command)
+        if result.returncode != 0:
+            break
+    return result
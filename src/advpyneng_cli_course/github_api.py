@@ -0,0 +1,83 @@
+import os
+from functools import lru_cache
+
+import requests
+
+from advpyneng_cli_course.exceptions import AdvPynengError, GithubConnectionError
+from advpyneng_cli_course.profiling import span
+from advpyneng_cli_course.utils import red
+
+
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_ORG = "pyneng"
+
+
+class GithubClient:
+    """
+    Клиент Github API, который использует одну HTTP сессию для всех запросов.
+    Адрес API можно заменить переменной окружения APYNENG_GITHUB_API_URL,
+    например, чтобы проверить работу с локальным тестовым сервером.
+    """
+
+    def __init__(self, token, verify_ssl_cert=True, api_url=None):
+        self.api_url = (
+            api_url or os.environ.get("APYNENG_GITHUB_API_URL") or GITHUB_API_URL
+        ).rstrip("/")
+        self.session = requests.Session()
+        self.session.verify = verify_ssl_cert
+        self.session.headers.update(
+            {
+                "Authorization": f"Bearer {token}",
+                "Accept": "application/vnd.github+json",
+            }
+        )
+
+    def request(self, method, path, **kwargs):
+        try:
+            with span(f"Github API {method} {path}"):
+                response = self.session.request(
+                    method, f"{self.api_url}{path}", timeout=30, **kwargs
+                )
+        except (requests.ConnectionError, requests.Timeout):
+            raise GithubConnectionError(
+                red(
+                    "Не получилось подключиться к GitHub. "
+                    "Возможно нет доступа в интернет?"
+                )
+            )
+        if response.status_code >= 500:
+            raise GithubConnectionError(
+                red(f"GitHub временно недоступен (ошибка {response.status_code})")
+            )
+        if response.status_code in (401, 403, 404):
+            raise AdvPynengError(
+                red("Аутентификация по токену не прошла. Задание не сдано на проверку")
+            )
+        if response.status_code == 422:
+            raise AdvPynengError(
+                red(
+                    "GitHub не нашел коммит. "
+                    "Проверьте, что изменения загружены на GitHub"
+                )
+            )
+        response.raise_for_status()
+        return response.json()
+
+    def create_commit_comment(self, repo, sha, body):
+        """
+        Написать комментарий к коммиту sha в репозитории pyneng/repo
+        """
+        return self.request(
+            "POST",
+            f"/repos/{GITHUB_ORG}/{repo}/commits/{sha}/comments",
+            json={"body": body},
+        )
+
+
+@lru_cache(maxsize=None)
+def get_github_client(token, verify_ssl_cert=True):
+    """
+    Возвращает клиента Github API. Для одинаковых параметров возвращается
+    один и тот же клиент, поэтому HTTP соединение переиспользуется.
+    """
+    return GithubClient(token, verify_ssl_cert=verify_ssl_cert)
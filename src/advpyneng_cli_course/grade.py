@@ -0,0 +1,248 @@
+"""
+Проверка заданий в репозиториях нескольких студентов (apyneng --grade).
+
+Каждый репозиторий проверяется в отдельном процессе
+(python -m advpyneng_cli_course.grade), поэтому зависшие тесты одного
+студента не блокируют проверку остальных: процесс завершается по таймауту.
+"""
+import os
+import re
+import sys
+import csv
+import json
+import shutil
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from advpyneng_cli_course import STUDENT_REPO_TEMPLATE, TASK_DIRS
+from advpyneng_cli_course.git import run_git
+from advpyneng_cli_course.utils import red, green
+
+
+GRADE_FIELDS = ["repo", "chapter", "task", "outcome"]
+
+
+def find_student_repos(root):
+    """
+    Функция возвращает список путей к репозиториям студентов в каталоге root:
+    рабочие копии (с каталогом exercises) и bare репозитории (name.git).
+    """
+    # путь к bare репозиторию используется в URL file://, поэтому
+    # он должен быть абсолютным
+    root = os.path.abspath(root)
+    repos = []
+    for entry in sorted(os.scandir(root), key=lambda entry: entry.name):
+        if not entry.is_dir():
+            continue
+        if not re.fullmatch(STUDENT_REPO_TEMPLATE, repo_name(entry.path)):
+            continue
+        is_bare = os.path.isfile(os.path.join(entry.path, "HEAD"))
+        if is_bare or os.path.isdir(os.path.join(entry.path, "exercises")):
+            repos.append(entry.path)
+    return repos
+
+
+def repo_name(repo_path):
+    name = os.path.basename(os.path.normpath(repo_path))
+    return name[: -len(".git")] if name.endswith(".git") else name
+
+
+def task_name(test_file):
+    """
+    test_task_14_1.py -> 14_1
+    """
+    return os.path.basename(test_file)[len("test_task_") : -len(".py")]
+
+
+def grade_records(repo, chapters_outcomes):
+    return [
+        {
+            "repo": repo,
+            "chapter": chapter,
+            "task": task_name(test_file),
+            "outcome": "passed" if passed else "failed",
+        }
+        for chapter, outcomes in sorted(chapters_outcomes.items())
+        for test_file, passed in sorted(outcomes.items())
+    ]
+
+
+def grade_repo(repo_path, chapters, pytest_args, timeout):
+    """
+    Функция проверяет задания разделов chapters в одном репозитории
+    в отдельном процессе. Если процесс не завершился за timeout секунд,
+    он завершается, а репозиторий получает результат timeout.
+    Возвращает список записей с результатами по каждому заданию.
+    """
+    repo = repo_name(repo_path)
+    # во временном каталоге создается клон bare репозитория и файл
+    # с результатом, каталог удаляется и после завершения процесса по таймауту
+    work_dir = tempfile.mkdtemp(prefix="apyneng-grade-")
+    result_file = os.path.join(work_dir, "result.json")
+    request = {
+        "repo": repo_path,
+        "work_dir": work_dir,
+        "chapters": chapters,
+        "pytest_args": pytest_args,
+    }
+    try:
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "advpyneng_cli_course.grade",
+                json.dumps(request),
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=timeout,
+        )
+        with open(result_file, encoding="utf-8") as f:
+            chapters_outcomes = json.load(f)
+    except subprocess.TimeoutExpired:
+        return [{"repo": repo, "chapter": "", "task": "", "outcome": "timeout"}]
+    except (OSError, ValueError):
+        # процесс проверки завершился с ошибкой и не записал результат
+        return [{"repo": repo, "chapter": "", "task": "", "outcome": "error"}]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return grade_records(repo, chapters_outcomes)
+
+
+def grade_summary(repo, records):
+    if records and not records[0]["task"]:
+        return red(f"{repo_name(repo)}: {records[0]['outcome']}")
+    passed = sum(record["outcome"] == "passed" for record in records)
+    return green(f"{repo_name(repo)}: прошли тесты {passed} из {len(records)}")
+
+
+def write_records(records, output, output_format):
+    if output_format == "json":
+        json.dump(records, output, ensure_ascii=False, indent=2)
+        output.write("\n")
+    elif output_format == "csv":
+        writer = csv.DictWriter(output, fieldnames=GRADE_FIELDS)
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def grade_repos(
+    root,
+    chapters=None,
+    output=None,
+    output_format="csv",
+    jobs=None,
+    timeout=600,
+    test_timeout=60,
+):
+    """
+    Функция проверяет задания во всех репозиториях студентов в каталоге root.
+    Одновременно проверяется jobs репозиториев (по умолчанию по количеству CPU),
+    проверка одного репозитория ограничена timeout секундами,
+    одного теста test_timeout секундами.
+    Результаты записываются в output (по умолчанию stdout) в формате
+    csv, json или ndjson. Записи ndjson выводятся по мере проверки
+    репозиториев, csv и json после проверки всех репозиториев
+    (в порядке репозиториев).
+    """
+    repos = find_student_repos(root)
+    if not repos:
+        print(red(f"В каталоге {root} не найдены репозитории студентов"))
+        return []
+    chapters = chapters or TASK_DIRS
+    jobs = jobs or os.cpu_count() or 1
+    pytest_args = [
+        "--disable-warnings",
+        "-q",
+        "--tb=no",
+        "-p",
+        "no:cacheprovider",
+        "--apyneng-task-fail-fast",
+        "--continue-on-collection-errors",
+        f"--apyneng-timeout={test_timeout}",
+    ]
+    out = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = {
+                executor.submit(grade_repo, repo, chapters, pytest_args, timeout): repo
+                for repo in repos
+            }
+            for future in as_completed(futures):
+                repo = futures[future]
+                records = future.result()
+                results[repo] = records
+                print(grade_summary(repo, records), file=sys.stderr)
+                if output_format == "ndjson":
+                    for record in records:
+                        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+        all_records = [record for repo in repos for record in results[repo]]
+        write_records(all_records, out, output_format)
+    finally:
+        if output:
+            out.close()
+    return all_records
+
+
+def _clone_bare_repo(repo_path, tmp_dir):
+    clone_dir = os.path.join(tmp_dir, repo_name(repo_path))
+    result = run_git("clone", "-q", "--depth", "1", f"file://{repo_path}", clone_dir)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return clone_dir
+
+
+def run_grade_worker(request):
+    """
+    Выполняется в отдельном процессе для одного репозитория. Тесты каждого
+    раздела запускаются отдельной сессией pytest в каталоге раздела.
+    Результат записывается в файл result.json во временном каталоге в формате
+    {раздел: {файл тестов: прошли ли все тесты файла}}.
+    """
+    from advpyneng_cli_course.runner import run_pytest_session
+
+    repo_dir = request["repo"]
+    if not os.path.isdir(os.path.join(repo_dir, "exercises")):
+        repo_dir = _clone_bare_repo(repo_dir, request["work_dir"])
+        # клон удаляется после проверки, байткод модулей заданий не нужен,
+        # а байткод тестов сохраняется в общем кэше по хешу содержимого
+        sys.dont_write_bytecode = True
+    if not os.path.isdir(os.path.join(repo_dir, "exercises")):
+        # например, HEAD bare репозитория указывает на несуществующую ветку;
+        # результат не записывается и репозиторий получает результат error
+        raise RuntimeError(f"В репозитории {repo_dir} нет каталога exercises")
+    chapters_outcomes = {}
+    for chapter in request["chapters"]:
+        chapter_dir = os.path.join(repo_dir, "exercises", chapter)
+        if not os.path.isdir(chapter_dir):
+            continue
+        test_files = sorted(
+            name
+            for name in os.listdir(chapter_dir)
+            if re.fullmatch(r"test_task_\w+\.py", name)
+        )
+        if not test_files:
+            continue
+        output, results = run_pytest_session(
+            test_files,
+            request["pytest_args"],
+            cwd=chapter_dir,
+            capture_output=True,
+        )
+        # файлы, тесты которых не запускались (например, ошибка импорта
+        # при сборе тестов), считаются не прошедшими
+        chapters_outcomes[chapter] = {
+            test_file: results["tasks"].get(test_file, False)
+            for test_file in test_files
+        }
+    result_file = os.path.join(request["work_dir"], "result.json")
+    with open(result_file, "w", encoding="utf-8") as f:
+        json.dump(chapters_outcomes, f)
+
+
+if __name__ == "__main__":
+    run_grade_worker(json.loads(sys.argv[1]))
@@ -0,0 +1,204 @@
+import os
+import time
+import sqlite3
+
+from advpyneng_cli_course.cache import RESULTS_CACHE_DIR
+
+
+HISTORY_DB = RESULTS_CACHE_DIR / "history.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    duration REAL NOT NULL,
+    check_mode INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    repo TEXT NOT NULL,
+    chapter TEXT NOT NULL,
+    task TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    passed INTEGER NOT NULL,
+    cached INTEGER NOT NULL,
+    submitted INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tests (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    repo TEXT NOT NULL,
+    chapter TEXT NOT NULL,
+    task TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    test TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_idx ON tasks (repo, chapter, task, timestamp);
+CREATE INDEX IF NOT EXISTS tests_idx ON tests (repo, chapter, task, timestamp);
+"""
+
+QUERIES = {
+    # среднее и максимальное время выполнения тестов по всем запускам
+    "slowest": """
+        SELECT chapter, test, COUNT(*),
+            ROUND(AVG(duration), 3), ROUND(MAX(duration), 3)
+        FROM tests
+        GROUP BY repo, chapter, test
+        ORDER BY AVG(duration) DESC
+        LIMIT ?
+    """,
+    # задания, которые раньше проходили тесты, а при последнем запуске нет
+    "regressions": """
+        WITH ordered AS (
+            SELECT repo, chapter, task, timestamp, passed,
+                ROW_NUMBER() OVER (
+                    PARTITION BY repo, chapter, task ORDER BY timestamp DESC
+                ) AS position
+            FROM tasks
+        )
+        SELECT last.chapter, last.task,
+            datetime(MAX(earlier.timestamp), 'unixepoch', 'localtime'),
+            datetime(last.timestamp, 'unixepoch', 'localtime')
+        FROM ordered AS last
+        JOIN ordered AS earlier
+            ON earlier.repo = last.repo
+            AND earlier.chapter = last.chapter
+            AND earlier.task = last.task
+            AND earlier.position > 1
+            AND earlier.passed = 1
+        WHERE last.position = 1 AND last.passed = 0
+        GROUP BY last.repo, last.chapter, last.task
+        ORDER BY last.timestamp DESC
+        LIMIT ?
+    """,
+    # время от первого запуска тестов задания до первого успешного запуска
+    # и количество запусков до успеха
+    "time-to-green": """
+        WITH firsts AS (
+            SELECT repo, chapter, task, MIN(timestamp) AS first_run,
+                MIN(CASE WHEN passed = 1 THEN timestamp END) AS first_green
+            FROM tasks
+            WHERE cached = 0
+            GROUP BY repo, chapter, task
+        )
+        SELECT firsts.chapter, firsts.task,
+            datetime(firsts.first_run, 'unixepoch', 'localtime'),
+            ROUND((firsts.first_green - firsts.first_run) / 60, 1),
+            COUNT(*)
+        FROM firsts
+        JOIN tasks
+            ON tasks.repo = firsts.repo
+            AND tasks.chapter = firsts.chapter
+            AND tasks.task = firsts.task
+            AND tasks.cached = 0
+            AND tasks.timestamp <= firsts.first_green
+        GROUP BY firsts.repo, firsts.chapter, firsts.task
+        ORDER BY firsts.chapter, firsts.task
+        LIMIT ?
+    """,
+}
+
+QUERY_HEADERS = {
+    "slowest": ["Раздел", "Тест", "Запусков", "Среднее, с", "Максимум, с"],
+    "regressions": ["Раздел", "Задание", "Последний успешный", "Последний запуск"],
+    "time-to-green": [
+        "Раздел",
+        "Задание",
+        "Первый запуск",
+        "До успеха, мин",
+        "Запусков",
+    ],
+}
+
+
+def connect(db_path=None):
+    connection = sqlite3.connect(db_path or HISTORY_DB)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def _task_location(test_file):
+    """
+    Функция возвращает (репозиторий, раздел, задание) для файла тестов:
+    .../advpyneng-1-user/exercises/14_generators/test_task_14_1.py ->
+    ("advpyneng-1-user", "14_generators", "14_1")
+    """
+    chapter_dir, name = os.path.split(os.path.abspath(test_file))
+    repo = os.path.basename(os.path.dirname(os.path.dirname(chapter_dir)))
+    task = name.replace("test_", "", 1).replace("task_", "", 1).replace(".py", "")
+    return repo, os.path.basename(chapter_dir), task
+
+
+def record_run(results, cached_tasks, submitted_tasks, started, check_mode):
+    """
+    Функция записывает в историю результаты запуска apyneng одной транзакцией:
+    результаты заданий (в том числе пропущенных по кэшу) и каждого теста.
+    """
+    timestamp = time.time()
+    submitted_tasks = set(submitted_tasks)
+    task_rows = []
+    for test_file, passed in results["tasks"].items():
+        task_rows.append(
+            (*_task_location(test_file), passed, False, test_file in submitted_tasks)
+        )
+    for test_file in cached_tasks:
+        task_rows.append(
+            (*_task_location(test_file), True, True, test_file in submitted_tasks)
+        )
+    test_rows = []
+    for nodeid, (outcome, duration) in results["tests"].items():
+        test_file, _, test = nodeid.partition("::")
+        test = f"{os.path.basename(test_file)}::{test}"
+        test_rows.append((*_task_location(test_file), test, outcome, duration))
+    if not task_rows and not test_rows:
+        return
+
+    RESULTS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    connection = connect()
+    try:
+        with connection:
+            run_id = connection.execute(
+                "INSERT INTO runs (started, duration, check_mode) VALUES (?, ?, ?)",
+                (started, timestamp - started, check_mode),
+            ).lastrowid
+            connection.executemany(
+                "INSERT INTO tasks (run_id, repo, chapter, task, timestamp, "
+                "passed, cached, submitted) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, *row[:3], timestamp, *row[3:]) for row in task_rows],
+            )
+            connection.executemany(
+                "INSERT INTO tests (run_id, repo, chapter, task, timestamp, "
+                "test, outcome, duration) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, *row[:3], timestamp, *row[3:]) for row in test_rows],
+            )
+    finally:
+        connection.close()
+
+
+def query_history(name, limit=20):
+    """
+    Функция возвращает (заголовки, строки) для запроса name из QUERIES
+    """
+    if not HISTORY_DB.exists():
+        return QUERY_HEADERS[name], []
+    connection = connect()
+    try:
+        rows = connection.execute(QUERIES[name], (limit,)).fetchall()
+    finally:
+        connection.close()
+    return QUERY_HEADERS[name], rows
+
+
+def print_history(name, limit=20):
+    from rich.console import Console
+    from rich.table import Table
+
+    headers, rows = query_history(name, limit)
+    if not rows:
+        print("В истории запусков нет данных для этого запроса")
+        return
+    table = Table(*headers)
+    for row in rows:
+        table.add_row(*[str(value) for value in row])
+    Console().print(table)
@@ -0,0 +1,365 @@
+import os
+import re
+import sys
+import math
+import time
+import signal
+import threading
+import contextlib
+from collections import defaultdict, Counter
+
+import pytest
+
+from advpyneng_cli_course.utils import red, green
+from advpyneng_cli_course.report_stream import REPORT_FORMATS, format_test_record
+
+try:
+    import resource
+except ImportError:
+    # в Windows нет модуля resource
+    resource = None
+
+
+class OutcomeCollector:
+    """
+    Плагин pytest, который по мере выполнения тестов запоминает результат
+    каждого теста в словаре outcomes (nodeid: outcome) и время выполнения
+    теста (setup, call и teardown) в словаре durations.
+    Вывод тестов и traceback не сохраняются.
+
+    Когда выполнены все тесты файла, результат задания можно сразу вывести
+    (progress=True), например, если вывод pytest перехвачен и будет показан
+    только после завершения сессии. С опцией --apyneng-stop-on-failed-task
+    сессия завершается после первого задания, которое не прошло тесты.
+    С опцией --apyneng-task-fail-fast после первого упавшего теста задания
+    остальные тесты этого задания пропускаются: задание уже не пройдено,
+    а тесты других заданий продолжают выполняться.
+    С опциями --apyneng-report-format и --apyneng-report-file результат
+    каждого теста дописывается в файл сразу после завершения теста.
+    """
+
+    def __init__(self, progress=False, progress_prefix=""):
+        self.outcomes = {}
+        self.durations = defaultdict(float)
+        self.progress = progress
+        self.progress_prefix = progress_prefix
+        self.remaining = Counter()
+        self.failed_files = set()
+        self.session = None
+        self.stop_on_failed_task = False
+        self.task_fail_fast = False
+        self.messages = {}
+        self.report_format = None
+        self.report_file = None
+        self.chapter = ""
+
+    def pytest_addoption(self, parser):
+        group = parser.getgroup("apyneng")
+        group.addoption(
+            "--apyneng-stop-on-failed-task",
+            action="store_true",
+            help="Остановить тесты после первого задания, которое не прошло тесты",
+        )
+        group.addoption(
+            "--apyneng-task-fail-fast",
+            action="store_true",
+            help="Пропускать остальные тесты задания после первого упавшего теста",
+        )
+        group.addoption(
+            "--apyneng-report-format",
+            choices=REPORT_FORMATS,
+            help="Формат файла с результатами тестов",
+        )
+        group.addoption(
+            "--apyneng-report-file",
+            help="Файл, в который дописываются результаты тестов",
+        )
+
+    def pytest_configure(self, config):
+        self.stop_on_failed_task = config.getoption("apyneng_stop_on_failed_task")
+        self.task_fail_fast = config.getoption("apyneng_task_fail_fast")
+        self.report_format = config.getoption("apyneng_report_format")
+        report_file = config.getoption("apyneng_report_file")
+        if self.report_format and report_file:
+            self.report_file = open(report_file, "a", encoding="utf-8")
+            self.chapter = os.path.basename(os.getcwd())
+
+    def pytest_unconfigure(self, config):
+        if self.report_file:
+            self.report_file.close()
+            self.report_file = None
+
+    def pytest_collection_finish(self, session):
+        self.session = session
+        if self.failed_files and self.stop_on_failed_task:
+            # задание с ошибкой при импорте уже не прошло тесты,
+            # остальные задания не запускаются
+            session.items.clear()
+        self.remaining = Counter(_test_file(item.nodeid) for item in session.items)
+
+    def pytest_collectreport(self, report):
+        # ошибка при импорте файла тестов или модуля задания:
+        # тесты файла не запускаются, задание не прошло тесты
+        if report.failed and report.nodeid.endswith(".py"):
+            self.outcomes[report.nodeid] = "error"
+            self.failed_files.add(report.nodeid)
+            self._task_finished(report.nodeid)
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_setup(self, item):
+        # пропуск до setup, поэтому фикстуры теста тоже не выполняются
+        if self.task_fail_fast and _test_file(item.nodeid) in self.failed_files:
+            pytest.skip("задание уже не прошло тесты")
+
+    def pytest_runtest_logreport(self, report):
+        self.durations[report.nodeid] += report.duration
+        if report.when == "call":
+            self.outcomes[report.nodeid] = report.outcome
+        elif report.failed:
+            # ошибка в setup или teardown
+            self.outcomes[report.nodeid] = "error"
+        elif report.skipped:
+            self.outcomes[report.nodeid] = "skipped"
+        if (report.failed or report.skipped) and report.nodeid not in self.messages:
+            self.messages[report.nodeid] = _short_message(report)
+        test_file = _test_file(report.nodeid)
+        if self.outcomes.get(report.nodeid, "passed") != "passed":
+            self.failed_files.add(test_file)
+        if report.when == "teardown":
+            if self.report_file:
+                self._write_record(report.nodeid)
+            self.remaining[test_file] -= 1
+            if self.remaining[test_file] == 0:
+                self._task_finished(test_file)
+
+    def _write_record(self, nodeid):
+        # каждая запись дописывается одной операцией записи, поэтому записи
+        # сессий из разных процессов в одном файле не перемешиваются
+        self.report_file.write(
+            format_test_record(
+                self.report_format,
+                self.chapter,
+                nodeid,
+                self.outcomes.get(nodeid, "passed"),
+                self.durations[nodeid],
+                self.messages.pop(nodeid, None),
+            )
+        )
+        self.report_file.flush()
+
+    def _task_finished(self, test_file):
+        passed = test_file not in self.failed_files
+        if self.progress:
+            status = green("тесты прошли") if passed else red("тесты не прошли")
+            sys.__stdout__.write(f"{self.progress_prefix}{test_file}: {status}\n")
+            sys.__stdout__.flush()
+        if not passed and self.stop_on_failed_task and self.session:
+            self.session.shouldstop = f"Задание {test_file} не прошло тесты"
+
+    def task_outcomes(self):
+        """
+        Возвращает словарь {файл тестов: True, если прошли все тесты файла}
+        для файлов, тесты которых запускались.
+        """
+        all_tests = defaultdict(list)
+        for nodeid, outcome in self.outcomes.items():
+            all_tests[_test_file(nodeid)].append(outcome == "passed")
+        return {name: all(outcome) for name, outcome in all_tests.items()}
+
+    def results(self):
+        """
+        Возвращает результаты сессии в виде, который можно передать
+        между процессами в JSON:
+        {"tasks": {файл тестов: прошли ли все тесты},
+         "tests": {nodeid: [outcome, время выполнения в секундах]}}
+        """
+        return {
+            "tasks": self.task_outcomes(),
+            "tests": {
+                nodeid: [outcome, round(self.durations[nodeid], 6)]
+                for nodeid, outcome in self.outcomes.items()
+            },
+        }
+
+    def passed_tasks(self):
+        """
+        Возвращает список файлов тестов, в которых прошли все тесты.
+        """
+        return [name for name, passed in self.task_outcomes().items() if passed]
+
+
+def _test_file(nodeid):
+    return nodeid.split("::")[0]
+
+
+def _short_message(report):
+    reprcrash = getattr(report.longrepr, "reprcrash", None)
+    if reprcrash is not None:
+        message = reprcrash.message
+    elif isinstance(report.longrepr, tuple):
+        # пропуск теста: (файл, строка, причина)
+        message = report.longrepr[-1]
+    else:
+        lines = str(report.longrepr).strip().splitlines()
+        message = lines[-1] if lines else report.outcome
+    # цвета pytest-clarity
+    return re.sub(r"\x1b\[[0-9;]*m", "", message).rstrip()
+
+
+class ExecutionLimits:
+    """
+    Плагин pytest, который ограничивает время выполнения каждого теста и
+    всей сессии pytest, а также процессорное время и память процесса с тестами.
+    Тест, который превысил ограничение, завершается с ошибкой (failed),
+    остальные тесты продолжают выполняться. Если время сессии закончилось,
+    оставшиеся тесты сразу завершаются с ошибкой.
+
+    Ограничения времени работают только в Linux и macOS (SIGALRM),
+    в Windows ограничения не применяются. Ограничения действуют только
+    во время сессии pytest, после нее восстанавливаются прежние значения.
+    """
+
+    def __init__(self):
+        self.timeout = None
+        self.max_cpu = None
+        self.deadline = None
+        self.saved_handlers = {}
+        self.saved_rlimits = {}
+
+    def pytest_addoption(self, parser):
+        group = parser.getgroup("apyneng")
+        group.addoption(
+            "--apyneng-timeout",
+            type=float,
+            default=0,
+            help="Максимальное время выполнения одного теста в секундах",
+        )
+        group.addoption(
+            "--apyneng-session-timeout",
+            type=float,
+            default=0,
+            help="Максимальное время выполнения всех тестов в секундах",
+        )
+        group.addoption(
+            "--apyneng-max-cpu",
+            type=int,
+            default=0,
+            help="Максимальное процессорное время одного теста в секундах",
+        )
+        group.addoption(
+            "--apyneng-max-memory",
+            type=int,
+            default=0,
+            help="Максимальный размер памяти процесса с тестами в МБ",
+        )
+
+    def pytest_sessionstart(self, session):
+        if not _limits_supported():
+            return
+        config = session.config
+        self.timeout = config.getoption("apyneng_timeout") or None
+        session_timeout = config.getoption("apyneng_session_timeout")
+        if session_timeout:
+            self.deadline = time.monotonic() + session_timeout
+        self.max_cpu = config.getoption("apyneng_max_cpu") or None
+        max_memory = config.getoption("apyneng_max_memory")
+
+        self._set_handler(signal.SIGALRM, self._on_timeout)
+        if self.max_cpu:
+            self._set_handler(signal.SIGXCPU, self._on_cpu_limit)
+            self.saved_rlimits[resource.RLIMIT_CPU] = resource.getrlimit(
+                resource.RLIMIT_CPU
+            )
+        if max_memory:
+            self._set_rlimit(resource.RLIMIT_AS, max_memory * 1024 * 1024)
+
+    def pytest_sessionfinish(self, session):
+        if not _limits_supported():
+            return
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        for signum, handler in self.saved_handlers.items():
+            signal.signal(signum, handler)
+        for limit, value in self.saved_rlimits.items():
+            resource.setrlimit(limit, value)
+        self.saved_handlers.clear()
+        self.saved_rlimits.clear()
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_make_collect_report(self, collector):
+        # модуль задания может зависнуть уже при импорте
+        with self._limited():
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(self, item):
+        if self.deadline and time.monotonic() >= self.deadline:
+            pytest.fail("Закончилось время выполнения тестов", pytrace=False)
+        with self._limited():
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        with self._limited():
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item):
+        with self._limited():
+            yield
+
+    @contextlib.contextmanager
+    def _limited(self):
+        if not self.saved_handlers:
+            yield
+            return
+        timeout = self.timeout
+        if self.deadline:
+            remaining = max(self.deadline - time.monotonic(), 0.001)
+            timeout = min(timeout, remaining) if timeout else remaining
+        if self.max_cpu:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            used = math.ceil(usage.ru_utime + usage.ru_stime)
+            self._set_rlimit(resource.RLIMIT_CPU, used + self.max_cpu)
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            yield
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            if self.max_cpu:
+                resource.setrlimit(
+                    resource.RLIMIT_CPU, self.saved_rlimits[resource.RLIMIT_CPU]
+                )
+
+    def _set_handler(self, signum, handler):
+        self.saved_handlers[signum] = signal.signal(signum, handler)
+
+    def _set_rlimit(self, limit, value):
+        soft, hard = resource.getrlimit(limit)
+        self.saved_rlimits.setdefault(limit, (soft, hard))
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        resource.setrlimit(limit, (value, hard))
+
+    def _on_timeout(self, signum, frame):
+        if not self.timeout or time.monotonic() >= (self.deadline or math.inf):
+            pytest.fail("Закончилось время выполнения тестов", pytrace=False)
+        pytest.fail(
+            f"Тест выполнялся дольше {self.timeout:g} с. "
+            "Возможно, в задании бесконечный цикл или event loop не завершается",
+            pytrace=False,
+        )
+
+    def _on_cpu_limit(self, signum, frame):
+        pytest.fail(
+            f"Тест использовал больше {self.max_cpu} с процессорного времени",
+            pytrace=False,
+        )
+
+
+def _limits_supported():
+    return (
+        resource is not None
+        and hasattr(signal, "SIGALRM")
+        and threading.current_thread() is threading.main_thread()
+    )
@@ -0,0 +1,87 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import contextlib
+from datetime import datetime
+from collections import defaultdict
+
+
+# список span, если профилирование включено (apyneng --profile)
+_spans = None
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def enable_profiling():
+    global _spans
+    _spans = []
+
+
+def span(name, **args):
+    """
+    Контекстный менеджер, который записывает время выполнения блока кода.
+    Если профилирование не включено, возвращается пустой контекстный менеджер.
+    """
+    if _spans is None:
+        return _NULL_SPAN
+    return _record_span(name, args)
+
+
+@contextlib.contextmanager
+def _record_span(name, args):
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        _spans.append(
+            {
+                "name": name,
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": (end - start) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+        )
+
+
+def write_chrome_trace(path=None):
+    """
+    Записывает span в формате Chrome trace (открывается в chrome://tracing
+    или https://ui.perfetto.dev). Возвращает путь к файлу.
+    """
+    if path is None:
+        filename = f"apyneng-profile-{datetime.now():%Y%m%d-%H%M%S}.json"
+        path = os.path.join(tempfile.gettempdir(), filename)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": _spans, "displayTimeUnit": "ms"}, f)
+    return path
+
+
+def profile_summary():
+    """
+    Возвращает строки с суммарным временем каждого этапа
+    """
+    totals = defaultdict(lambda: [0, 0.0])
+    for item in _spans:
+        totals[item["name"]][0] += 1
+        totals[item["name"]][1] += item["dur"] / 1000
+    lines = [f"{'Этап':<50} {'Вызовов':>8} {'Время, мс':>12}"]
+    for name, (count, total) in sorted(
+        totals.items(), key=lambda item: item[1][1], reverse=True
+    ):
+        lines.append(f"{name[:50]:<50} {count:>8} {total:>12.1f}")
+    return lines
+
+
+def finish_profiling():
+    if _spans is None:
+        return
+    path = write_chrome_trace()
+    print()
+    for line in profile_summary():
+        print(line)
+    print(f"\nПрофиль записан в файл {path}")
@@ -0,0 +1,98 @@
+"""
+Вывод результатов тестов в файл в формате NDJSON или JUnit XML
+(apyneng --format ndjson|junit --output FILE).
+
+Файл создается в основном процессе apyneng (start_report), затем каждая
+сессия pytest (в том числе в других процессах) дописывает в него запись
+о каждом тесте сразу после его завершения, а в конце основной процесс
+дописывает итог по заданиям (finish_report). Записи не накапливаются
+в памяти, поэтому файл можно читать по мере записи (tail -f).
+"""
+import os
+import re
+import json
+import time
+from xml.sax.saxutils import escape, quoteattr
+
+
+REPORT_FORMATS = ["ndjson", "junit"]
+
+
+def start_report(path, report_format):
+    with open(path, "w", encoding="utf-8") as f:
+        if report_format == "junit":
+            f.write('<?xml version="1.0" encoding="utf-8"?>\n<testsuites>\n')
+            f.write('<testsuite name="apyneng">\n')
+
+
+def format_test_record(report_format, chapter, nodeid, outcome, duration, message=None):
+    """
+    Функция возвращает строку с записью о результате одного теста
+    """
+    test_file, _, test = nodeid.partition("::")
+    task = os.path.basename(test_file).replace("test_task_", "").replace(".py", "")
+    if report_format == "ndjson":
+        record = {
+            "type": "test",
+            "chapter": chapter,
+            "task": task,
+            "nodeid": nodeid,
+            "outcome": outcome,
+            "duration": round(duration, 6),
+            "message": message,
+            "timestamp": round(time.time(), 3),
+        }
+        return json.dumps(record, ensure_ascii=False) + "\n"
+    # управляющие символы недопустимы в XML
+    message = message and re.sub(r"[\x00-\x08\x0b\x0c\x0e-\x1f]", "", message)
+    classname = f"{chapter}.{test_file.replace('.py', '')}"
+    testcase = (
+        f"<testcase classname={quoteattr(classname)} name={quoteattr(test)} "
+        f'time="{duration:.6f}"'
+    )
+    if outcome == "passed":
+        return testcase + "/>\n"
+    tag = "skipped" if outcome == "skipped" else "failure"
+    return (
+        f"{testcase}><{tag} message={quoteattr(message or outcome)}>"
+        f"{escape(message or '')}</{tag}></testcase>\n"
+    )
+
+
+def finish_report(path, report_format, task_outcomes):
+    """
+    Функция дописывает итог по заданиям: задание прошло тесты,
+    если прошли все тесты задания. task_outcomes это словарь
+    {файл тестов: прошли ли тесты}.
+    """
+    tasks = {
+        os.path.basename(test_file).replace("test_task_", "").replace(".py", ""): passed
+        for test_file, passed in sorted(task_outcomes.items())
+    }
+    with open(path, "a", encoding="utf-8") as f:
+        if report_format == "ndjson":
+            record = {
+                "type": "summary",
+                "tasks": {
+                    task: "passed" if passed else "failed"
+                    for task, passed in tasks.items()
+                },
+                "passed": sum(tasks.values()),
+                "total": len(tasks),
+            }
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            return
+        failures = len(tasks) - sum(tasks.values())
+        f.write("</testsuite>\n")
+        f.write(
+            f'<testsuite name="tasks" tests="{len(tasks)}" failures="{failures}">\n'
+        )
+        for task, passed in tasks.items():
+            if passed:
+                f.write(f"<testcase classname=\"tasks\" name={quoteattr(task)}/>\n")
+            else:
+                f.write(
+                    f'<testcase classname="tasks" name={quoteattr(task)}>'
+                    '<failure message="не все тесты задания прошли"/></testcase>\n'
+                )
+        f.write("</testsuite>\n</testsuites>\n")
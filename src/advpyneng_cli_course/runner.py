@@ -0,0 +1,272 @@
+import io
+import os
+import sys
+import math
+import contextlib
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from advpyneng_cli_course.daemon import run_tests_in_daemon
+from advpyneng_cli_course.bytecode_cache import enable_shared_bytecode_cache
+from advpyneng_cli_course.profiling import span
+
+
+@contextlib.contextmanager
+def isolated_session(cwd=None):
+    """
+    Контекстный менеджер восстанавливает sys.path и текущий каталог после
+    сессии pytest и выгружает модули, загруженные из каталога сессии.
+    Это нужно, когда в одном процессе последовательно запускаются тесты
+    разных разделов: модули заданий и вспомогательные модули
+    (например, common_functions) не должны переиспользоваться между сессиями.
+    """
+    modules_before = set(sys.modules)
+    path_before = list(sys.path)
+    cwd_before = os.getcwd()
+    if cwd:
+        os.chdir(cwd)
+    session_dir = os.getcwd()
+    try:
+        yield
+    finally:
+        os.chdir(cwd_before)
+        sys.path[:] = path_before
+        for module_name in set(sys.modules) - modules_before:
+            module_file = getattr(sys.modules[module_name], "__file__", None) or ""
+            if os.path.abspath(module_file).startswith(session_dir + os.sep):
+                del sys.modules[module_name]
+
+
+def run_pytest_session(
+    test_files, pytest_args, cwd=None, capture_output=False, progress_prefix=""
+):
+    """
+    Запускает одну сессию pytest для файлов test_files в указанном порядке.
+    Возвращает кортеж (вывод pytest, результаты OutcomeCollector.results()).
+    Если capture_output=False, вывод pytest печатается сразу и
+    вместо него возвращается пустая строка. Если вывод перехватывается,
+    результат каждого задания выводится сразу после завершения его тестов.
+    """
+    # pytest импортируется только при запуске сессии, чтобы клиент
+    # фонового процесса (run_tests_in_daemon) не загружал pytest
+    import pytest
+    from advpyneng_cli_course.plugin import OutcomeCollector, ExecutionLimits
+
+    collector = OutcomeCollector(
+        progress=capture_output, progress_prefix=progress_prefix
+    )
+    # кэш pytest (.pytest_cache) apyneng не использует, а байткод
+    # сохраняется в общем кэше, чтобы не создавать файлы в каталоге заданий
+    enable_shared_bytecode_cache()
+    pytest_args = list(pytest_args)
+    if "no:cacheprovider" not in pytest_args:
+        pytest_args += ["-p", "no:cacheprovider"]
+    output = io.StringIO()
+    if capture_output:
+        redirect = contextlib.redirect_stdout(output)
+    else:
+        redirect = contextlib.nullcontext()
+    with isolated_session(cwd), redirect, span("pytest session", cwd=cwd or "."):
+        pytest.main(
+            list(test_files) + pytest_args,
+            plugins=[collector, ExecutionLimits()],
+        )
+    with span("report parsing"):
+        results = collector.results()
+    return output.getvalue(), results
+
+
+def empty_results():
+    return {"tasks": {}, "tests": {}}
+
+
+def merge_results(results, session_results, chapter=""):
+    """
+    Добавляет в results результаты одной сессии pytest. Если сессия
+    запускалась в каталоге раздела chapter, к путям добавляется каталог раздела.
+    """
+    for test_file, passed in session_results["tasks"].items():
+        results["tasks"][os.path.join(chapter, test_file)] = passed
+    for nodeid, test_result in session_results["tests"].items():
+        results["tests"][os.path.join(chapter, nodeid)] = test_result
+
+
+# ожидаемое время выполнения тестов файла, который еще не запускался,
+# и минимальное общее время тестов, при котором есть смысл запускать
+# несколько процессов (запуск процесса тоже занимает время)
+UNKNOWN_FILE_DURATION = 0.5
+PARALLEL_MIN_WORKLOAD = 1.0
+
+
+def estimated_durations(durations):
+    """
+    Функция заменяет неизвестное время выполнения (None) средним временем
+    файлов, которые уже запускались.
+    """
+    known = [duration for duration in durations.values() if duration is not None]
+    default = sum(known) / len(known) if known else UNKNOWN_FILE_DURATION
+    return {
+        name: default if duration is None else duration
+        for name, duration in durations.items()
+    }
+
+
+def auto_jobs(durations):
+    """
+    Функция выбирает количество процессов по количеству CPU и ожидаемому
+    времени выполнения групп тестов durations (список в секундах):
+    тесты не могут выполниться быстрее самой долгой группы, поэтому
+    процессов больше, чем общее время / время самой долгой группы,
+    не нужно.
+    """
+    total = sum(durations)
+    longest = max(durations, default=0)
+    if total < PARALLEL_MIN_WORKLOAD or not longest:
+        return 1
+    workers = math.ceil(total / longest)
+    return max(1, min(workers, len(durations), os.cpu_count() or 1))
+
+
+def split_test_files(test_files, jobs, durations=None):
+    """
+    Распределяет файлы тестов по jobs группам. Все тесты одного файла
+    всегда попадают в одну группу, порядок файлов в группах сохраняется.
+    Если известно время выполнения файлов durations ({файл: секунды}),
+    файлы распределяются начиная с самых долгих, каждый в группу
+    с наименьшим общим временем, чтобы группы выполнялись примерно
+    одинаковое время.
+    """
+    shards = [[] for _ in range(min(jobs, len(test_files)))]
+    if not durations:
+        for index, test_file in enumerate(test_files):
+            shards[index % len(shards)].append(test_file)
+        return shards
+    loads = [0.0] * len(shards)
+    shard_of = {}
+    for test_file in sorted(test_files, key=lambda name: -durations[name]):
+        index = loads.index(min(loads))
+        loads[index] += durations[test_file]
+        shard_of[test_file] = index
+    for test_file in test_files:
+        shards[shard_of[test_file]].append(test_file)
+    return shards
+
+
+def run_pytest_parallel(test_files, pytest_args, jobs, durations=None):
+    """
+    Запускает тесты в jobs процессах, каждый процесс запускает свою
+    сессию pytest. Результат каждого задания выводится сразу, а вывод
+    каждой сессии печатается целиком, когда она завершилась.
+    Возвращает результаты всех сессий (как OutcomeCollector.results()).
+    """
+    if sys.stdout.isatty():
+        pytest_args = [*pytest_args, "--color=yes"]
+    shards = split_test_files(test_files, jobs, durations)
+    cwd = os.getcwd()
+    results = empty_results()
+    with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+        futures = [
+            executor.submit(
+                run_pytest_session, shard, pytest_args, cwd, capture_output=True
+            )
+            for shard in shards
+        ]
+        for future in as_completed(futures):
+            output, session_results = future.result()
+            print(output, end="")
+            merge_results(results, session_results)
+    return results
+
+
+def run_chapters_tests(
+    test_files, pytest_args, jobs=1, stop_on_failed_task=False, durations=None
+):
+    """
+    Запускает тесты нескольких разделов одновременно. test_files это пути
+    вида 14_generators/test_task_14_1.py относительно каталога exercises
+    или ../14_generators/test_task_14_1.py относительно каталога раздела.
+    Тесты каждого раздела запускаются отдельной сессией pytest в каталоге
+    раздела. Если jobs не больше 1, количество процессов выбирается
+    по количеству CPU и времени выполнения разделов (auto_jobs).
+    Разделы запускаются в порядке первых файлов тестов раздела в test_files,
+    а если известно время выполнения файлов durations ({файл: секунды}),
+    начиная с самых долгих разделов. Если stop_on_failed_task=True,
+    разделы запускаются в порядке test_files, а разделы, которые еще
+    не начали выполняться, отменяются после первого задания с ошибкой.
+    Возвращает результаты всех сессий (как OutcomeCollector.results())
+    с путями относительно каталога exercises.
+    """
+    if sys.stdout.isatty():
+        pytest_args = [*pytest_args, "--color=yes"]
+    chapters_tests = defaultdict(list)
+    for test_file in test_files:
+        chapter, test_name = os.path.split(test_file)
+        chapters_tests[chapter].append(test_name)
+    if not chapters_tests:
+        return empty_results()
+    durations = estimated_durations(
+        durations or dict.fromkeys(test_files)
+    )
+    chapters_durations = {
+        chapter: sum(durations[os.path.join(chapter, name)] for name in tests)
+        for chapter, tests in chapters_tests.items()
+    }
+    if not stop_on_failed_task:
+        chapters_tests = dict(
+            sorted(
+                chapters_tests.items(),
+                key=lambda item: -chapters_durations[item[0]],
+            )
+        )
+    if jobs > 1:
+        workers = min(jobs, len(chapters_tests))
+    else:
+        workers = auto_jobs(list(chapters_durations.values()))
+    results = empty_results()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                run_pytest_session,
+                tests,
+                pytest_args,
+                chapter,
+                capture_output=True,
+                progress_prefix=os.path.join(chapter, ""),
+            ): chapter
+            for chapter, tests in chapters_tests.items()
+        }
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            chapter = futures[future]
+            output, session_results = future.result()
+            print("#" * 20, os.path.basename(os.path.abspath(chapter)))
+            print(output, end="")
+            merge_results(results, session_results, chapter)
+            if stop_on_failed_task and not all(session_results["tasks"].values()):
+                for pending in futures:
+                    pending.cancel()
+    return results
+
+
+def run_tests(test_files, pytest_args, jobs=1, durations=None):
+    """
+    Запускает тесты последовательно в текущем процессе или,
+    если jobs > 1, параллельно в нескольких процессах.
+    Если jobs равно 0, количество процессов выбирается по количеству CPU
+    и времени выполнения файлов durations ({файл: секунды или None}).
+    Если запущен фоновый процесс apyneng (apyneng --daemon start),
+    последовательный запуск выполняется в нем.
+    Возвращает результаты (как OutcomeCollector.results()).
+    """
+    if durations:
+        durations = estimated_durations(durations)
+    if jobs == 0:
+        jobs = auto_jobs(list((durations or {}).values()))
+    if jobs > 1 and len(test_files) > 1:
+        return run_pytest_parallel(test_files, pytest_args, jobs, durations)
+    results = run_tests_in_daemon(test_files, pytest_args)
+    if results is not None:
+        return results
+    output, results = run_pytest_session(test_files, pytest_args)
+    return results
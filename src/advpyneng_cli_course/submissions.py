@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import tempfile
+from datetime import datetime
+
+from advpyneng_cli_course.cache import RESULTS_CACHE_DIR
+from advpyneng_cli_course.git import is_git_repo
+from advpyneng_cli_course.exceptions import (
+    AdvPynengError,
+    GithubConnectionError,
+    GitPushRejectedError,
+)
+from advpyneng_cli_course.utils import (
+    red,
+    green,
+    push_changes,
+    post_comment_to_commit,
+)
+
+
+SUBMISSIONS_QUEUE_FILE = RESULTS_CACHE_DIR / "submissions.json"
+# количество попыток отправки и задержка перед второй попыткой в секундах,
+# после каждой неудачной попытки задержка увеличивается в два раза
+FLUSH_RETRIES = 4
+FLUSH_BACKOFF = 1
+
+
+def load_submissions():
+    try:
+        with open(SUBMISSIONS_QUEUE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def save_submissions(queue):
+    """
+    Очередь записывается во временный файл, который затем переименовывается,
+    поэтому файл очереди не может остаться записанным наполовину.
+    """
+    RESULTS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=RESULTS_CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(queue, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_name, SUBMISSIONS_QUEUE_FILE)
+
+
+def enqueue_submission(repo, repo_dir, branch, commit_sha, tasks):
+    """
+    Функция добавляет в очередь сдачу заданий tasks (список номеров заданий
+    вида "14_1"), которые сохранены в локальном коммите commit_sha.
+    """
+    queue = load_submissions()
+    queue.append(
+        {
+            "repo": repo,
+            "repo_dir": repo_dir,
+            "branch": branch,
+            "sha": commit_sha,
+            "tasks": tasks,
+            "message": f"Сделаны задания {' '.join(tasks)}",
+            "created": datetime.now().isoformat(timespec="seconds"),
+        }
+    )
+    save_submissions(queue)
+
+
+def submission_message(submissions):
+    """
+    Функция объединяет несколько сдач заданий в одно сообщение
+    """
+    if len(submissions) == 1:
+        return submissions[0]["message"]
+    tasks = sorted({task for item in submissions for task in item["tasks"]})
+    return f"Сделаны задания {' '.join(tasks)}"
+
+
+def _retry(func, retries, backoff, exceptions):
+    """
+    Функция вызывает func до retries раз, пока func возвращает False или
+    генерирует одно из исключений exceptions. Перед каждой следующей попыткой
+    задержка увеличивается в два раза.
+    """
+    for attempt in range(retries):
+        if attempt:
+            delay = backoff * 2 ** (attempt - 1)
+            print(f"Повторная попытка через {delay} с...")
+            time.sleep(delay)
+        try:
+            if func():
+                return True
+        except exceptions as error:
+            print(error)
+    return False
+
+
+def flush_submissions(
+    ignore_ssl_cert=False,
+    retries=FLUSH_RETRIES,
+    backoff=FLUSH_BACKOFF,
+    current_repo=None,
+):
+    """
+    Функция отправляет очередь сдачи заданий. Для каждого репозитория
+    выполняется один git push и пишется один комментарий к последнему коммиту
+    из очереди со всеми заданиями, поэтому несколько сдач подряд без доступа
+    к GitHub отправляются вместе. Если указан current_repo, повторные попытки
+    выполняются только для этого репозитория, остальные отправляются один раз.
+
+    Сдачи, которые не удалось отправить из-за сети, остаются в очереди.
+    Если git push завершился другой ошибкой или каталога репозитория больше
+    нет, повторная попытка не поможет, поэтому сдачи удаляются из очереди.
+    Возвращает словарь {репозиторий: хеш коммита с комментарием}.
+    """
+    queue = load_submissions()
+    if not queue:
+        return {}
+    groups = {}
+    for item in queue:
+        key = (item["repo"], item["repo_dir"], item["branch"])
+        groups.setdefault(key, []).append(item)
+
+    sent = {}
+    remaining = []
+    errors = {}
+    for (repo, repo_dir, branch), submissions in groups.items():
+        commit_sha = submissions[-1]["sha"]
+        if not is_git_repo(repo_dir):
+            tasks = sorted({task for item in submissions for task in item["tasks"]})
+            print(
+                red(
+                    f"Каталог репозитория {repo_dir} не найден, сдача заданий "
+                    f"{' '.join(tasks)} удалена из очереди"
+                )
+            )
+            continue
+        attempts = retries if current_repo in (None, repo) else 1
+
+        def push():
+            return push_changes(branch, repo_dir=repo_dir)
+
+        def comment():
+            message = submission_message(submissions)
+            post_comment_to_commit(
+                message, repo, commit_sha, ignore_ssl_cert=ignore_ssl_cert
+            )
+            return True
+
+        try:
+            if _retry(push, attempts, backoff, ()) and _retry(
+                comment, attempts, backoff, GithubConnectionError
+            ):
+                sent[repo] = commit_sha
+                continue
+        except GitPushRejectedError as error:
+            # повторная отправка тоже завершится ошибкой, поэтому сдачи
+            # удаляются из очереди, а задания надо сдать заново
+            errors[repo] = GitPushRejectedError(
+                f"{error}\n"
+                + red(
+                    "Задания удалены из очереди сдачи. Исправьте ошибку "
+                    "(например, если git push отклонен, выполните git pull "
+                    "и исправьте конфликты) и сдайте задания заново: apyneng -c"
+                )
+            )
+            continue
+        except AdvPynengError as error:
+            # ошибка токена не исправится повторной попыткой
+            errors[repo] = error
+        remaining.extend(submissions)
+
+    # пока шла отправка, в очередь могли добавиться новые сдачи
+    sent_items = [item for item in queue if item not in remaining]
+    save_submissions([item for item in load_submissions() if item not in sent_items])
+    if remaining:
+        print(
+            red(
+                "Не удалось отправить задания на GitHub, они сохранены в очереди. "
+                "Задания будут отправлены при следующем запуске apyneng "
+                "или командой apyneng --flush"
+            )
+        )
+    if current_repo is not None:
+        # ошибки сдач других репозиториев не прерывают сдачу текущего
+        for repo, error in errors.items():
+            if repo != current_repo:
+                print(error)
+        if current_repo in errors:
+            raise errors[current_repo]
+    elif errors:
+        raise next(iter(errors.values()))
+    return sent
+
+
+def flush_pending_submissions(ignore_ssl_cert=False, retries=1):
+    """
+    Функция отправляет сдачи заданий, которые остались в очереди после
+    предыдущих запусков apyneng. Ошибки аутентификации не прерывают
+    работу apyneng, сдачи остаются в очереди.
+    """
+    if not load_submissions() or not os.environ.get("GITHUB_TOKEN"):
+        return
+    print(green("Отправка заданий, которые остались в очереди сдачи"))
+    try:
+        sent = flush_submissions(ignore_ssl_cert=ignore_ssl_cert, retries=retries)
+    except AdvPynengError as error:
+        print(error)
+        return
+    for repo, commit_sha in sent.items():
+        print(
+            green(
+                f"Задания из очереди сданы на проверку: "
+                f"https://github.com/pyneng/{repo}/commit/{commit_sha}"
+            )
+        )
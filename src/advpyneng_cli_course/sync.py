@@ -0,0 +1,88 @@
+import os
+import shutil
+import hashlib
+from collections import namedtuple
+
+
+FileChange = namedtuple("FileChange", ["status", "path"])
+
+IGNORED_DIRS = {"__pycache__", ".pytest_cache", ".git"}
+CHANGE_STATUS_NAMES = {
+    "added": "добавлен",
+    "modified": "изменен",
+    "removed": "удален",
+}
+
+
+def _file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def file_manifest(root, files=None):
+    """
+    Функция возвращает словарь {путь относительно root: (размер, путь)}
+    для всех файлов в каталоге root или только для файлов files.
+    Хеш содержимого считается позже и только для файлов одинакового размера.
+    """
+    manifest = {}
+    if files is not None:
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.isfile(path):
+                manifest[os.path.normpath(name)] = (os.path.getsize(path), path)
+        return manifest
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in IGNORED_DIRS]
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            manifest[os.path.relpath(path, root)] = (os.path.getsize(path), path)
+    return manifest
+
+
+def _same_content(src_entry, dst_entry):
+    src_size, src_path = src_entry
+    dst_size, dst_path = dst_entry
+    return src_size == dst_size and _file_hash(src_path) == _file_hash(dst_path)
+
+
+def sync_files(src_dir, dst_dir, files=None, remove_missing=False):
+    """
+    Функция копирует из src_dir в dst_dir только те файлы, содержимое которых
+    отличается. Одинаковые файлы не перезаписываются, поэтому у них
+    сохраняется время изменения. Если remove_missing=True, из dst_dir удаляются
+    файлы, которых нет в src_dir (как при удалении и копировании каталога).
+
+    Возвращает список FileChange со статусом added, modified или removed
+    и путем относительно dst_dir.
+    """
+    if not os.path.isdir(src_dir):
+        raise FileNotFoundError(f"Каталог {src_dir} не найден")
+    src_manifest = file_manifest(src_dir, files)
+    dst_manifest = file_manifest(dst_dir, files) if os.path.isdir(dst_dir) else {}
+    changes = []
+    for name, src_entry in sorted(src_manifest.items()):
+        dst_entry = dst_manifest.get(name)
+        if dst_entry and _same_content(src_entry, dst_entry):
+            continue
+        dst_path = os.path.join(dst_dir, name)
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        shutil.copy2(src_entry[1], dst_path)
+        changes.append(FileChange("modified" if dst_entry else "added", name))
+    if remove_missing:
+        for name in sorted(set(dst_manifest) - set(src_manifest)):
+            os.remove(dst_manifest[name][1])
+            changes.append(FileChange("removed", name))
+    return changes
+
+
+def format_changes(changes, prefix=""):
+    """
+    Функция возвращает строки вида "    изменен   task_14_1.py"
+    для вывода списка изменений пользователю
+    """
+    return [
+        f"    {CHANGE_STATUS_NAMES[change.status]:<10}"
+        f"{os.path.join(prefix, change.path)}"
+        for change in changes
+    ]
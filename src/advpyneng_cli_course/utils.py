@@ -1,20 +1,26 @@
-import subprocess
 from platform import system as system_name
 import re
 import os
-from collections import defaultdict
-import tempfile
 import pathlib
 import stat
 import shutil
-from datetime import datetime, timedelta
 
 import click
-import github
-from rich import print as rprint
-from rich.padding import Padding
 
-from advpyneng_cli_course.exceptions import AdvPynengError
+from advpyneng_cli_course.exceptions import AdvPynengError, GitPushRejectedError
+from advpyneng_cli_course.sync import sync_files, format_changes
+from advpyneng_cli_course.git import (
+    print_git_result,
+    git_status,
+    git_add,
+    git_commit,
+    git_push,
+    git_remote_urls,
+    git_rev_parse,
+    git_toplevel,
+    git_sparse_clone,
+    git_sparse_update,
+)
 from advpyneng_cli_course import (
     ANSWERS_URL,
     TASKS_URL,
@@ -40,74 +46,80 @@ def remove_readonly(func, path, _):
     func(path)
 
 
-def call_command(command, verbose=True, return_stdout=False, return_stderr=False):
+def working_dir_clean(status=None):
     """
-    Функция вызывает указанную command через subprocess
-    и выводит stdout и stderr, если флаг verbose=True.
+    status это результат git_status(), если он уже был получен,
+    тогда git status повторно не вызывается.
     """
-    result = subprocess.run(
-        command,
-        shell=True,
-        encoding="utf-8",
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-    )
-    std = result.stdout
-    stderr = result.stderr
-    if return_stdout:
-        return std
-    if return_stderr:
-        return result.returncode, stderr
-    if verbose:
-        print("#" * 20, command)
-        if std:
-            print(std)
-        if stderr:
-            print(stderr)
-    return result.returncode
-
-
-def working_dir_clean():
-    git_status = call_command("git status --porcelain", return_stdout=True)
-    if git_status:
-        return False
-    else:
-        return True
-
-
-def show_git_diff_short():
-    git_diff = call_command("git diff --stat")
-    git_status = call_command("git status")
+    if status is None:
+        status = git_status()
+    return not status
 
 
-def git_push(branch):
+def commit_changes(message, git_add_all=True, status=None):
     """
-    Функция вызывает git push для Windows
+    Функция делает git commit (и git add ., если git_add_all=True).
+    Возвращает False, если в репозитории нет изменений.
     """
-    command = f"git push origin {branch}"
-    print("#" * 20, command)
-    result = subprocess.run(command, shell=True)
-
-
-def save_changes_to_github(
-    message="Все изменения сохранены", git_add_all=True, branch="main"
-):
-    status = call_command("git status -s", return_stdout=True)
+    if status is None:
+        status = git_status()
     if not status:
-        return
+        return False
     if git_add_all:
-        call_command("git add .")
-    call_command(f'git commit -m "{message}"')
+        print_git_result(git_add(["."]))
+    print_git_result(git_commit(message))
+    return True
+
+
+# ошибки git push из-за сети, после которых git push можно повторить
+PUSH_NETWORK_ERRORS = [
+    "Could not resolve host",
+    "Temporary failure in name resolution",
+    "Connection timed out",
+    "Operation timed out",
+    "Connection refused",
+    "Connection reset",
+    "Network is unreachable",
+    "Failed to connect",
+    "The remote end hung up unexpectedly",
+]
+
+
+def push_changes(branch="main", repo_dir=None):
+    """
+    Функция делает git push и возвращает True, если он прошел успешно,
+    и False, если не получилось подключиться к репозиторию из-за сети.
+    Другие ошибки git push не исправятся повторной попыткой
+    (например, в репозитории на GitHub есть коммиты, которых нет локально),
+    для них генерируется исключение GitPushRejectedError.
+    """
     windows = True if system_name().lower() == "windows" else False
 
     if windows:
-        git_push(branch)
+        # в Windows вывод git push не перехватывается
+        print("#" * 20, f"git push origin {branch}")
+        result = git_push(branch, capture_output=False, repo_dir=repo_dir)
     else:
-        call_command(f"git push origin {branch}")
+        result = git_push(branch, repo_dir=repo_dir)
+        if result.returncode != 0 and not any(
+            error in result.stderr for error in PUSH_NETWORK_ERRORS
+        ):
+            raise GitPushRejectedError(
+                red(f"git push завершился с ошибкой:\n{result.stderr.strip()}")
+            )
+        print_git_result(result)
+    return result.returncode == 0
+
+
+def save_changes_to_github(
+    message="Все изменения сохранены", git_add_all=True, branch="main", status=None
+):
+    if commit_changes(message, git_add_all=git_add_all, status=status):
+        push_changes(branch)
 
 
 def get_repo(search_pattern=STUDENT_REPO_TEMPLATE):
-    git_remote = call_command("git remote -v", return_stdout=True)
+    git_remote = git_remote_urls()
     repo_match = re.search(search_pattern, git_remote)
     if repo_match:
         repo = repo_match.group()
@@ -121,54 +133,53 @@ def get_repo(search_pattern=STUDENT_REPO_TEMPLATE):
         )
 
 
-def test_run_for_github_token():
+def test_run_for_github_token(branch="main", ignore_ssl_cert=False):
     """
-    Функция добавляет тестовое сообщение к последнему за 2 недели коммиту
+    Функция добавляет тестовое сообщение к последнему загруженному на GitHub коммиту
     """
     message = "Проверка работы токена прошла успешно"
     repo = get_repo()
-    last = post_comment_to_last_commit(message, repo)
-    commit_number = re.search(r'"(\w+)"', str(last)).group(1)
+    commit_sha = post_comment_to_last_commit(
+        message, repo, branch=branch, ignore_ssl_cert=ignore_ssl_cert
+    )
     print(
         green(
             f"Комментарий можно посмотреть по ссылке "
-            f"https://github.com/pyneng/{repo}/commit/{commit_number}"
+            f"https://github.com/pyneng/{repo}/commit/{commit_sha}"
         )
     )
 
 
-def post_comment_to_last_commit(msg, repo, delta_days=60, ignore_ssl_cert=False):
+def post_comment_to_last_commit(msg, repo, branch="main", ignore_ssl_cert=False):
     """
     Написать комментарий о сдаче заданий в последнем коммите.
     Комментарий пишется через Github API.
 
-    Для работы функции должен быть настроен git.
-    Функция пытается определить имя пользователя git из вывода git config --list,
-    Если это не получается, запрашивает имя пользователя.
+    Хеш последнего коммита берется из локального репозитория (ветка origin/branch,
+    то есть последний загруженный на GitHub коммит), поэтому к API
+    выполняется только один запрос.
+
+    Токен берется из переменной окружения GITHUB_TOKEN.
+    Функция возвращает хеш коммита.
+    """
+    commit_sha = git_rev_parse(f"origin/{branch}") or git_rev_parse("HEAD")
+    if not commit_sha:
+        raise AdvPynengError(red("В репозитории не найдено коммитов"))
+    post_comment_to_commit(msg, repo, commit_sha, ignore_ssl_cert=ignore_ssl_cert)
+    return commit_sha
+
 
-    Пароль берется из переменной окружения GITHUB_PASS или запрашивается.
+def post_comment_to_commit(msg, repo, commit_sha, ignore_ssl_cert=False):
     """
+    Написать комментарий msg к коммиту commit_sha через Github API.
+    Токен берется из переменной окружения GITHUB_TOKEN.
+    """
+    from advpyneng_cli_course.github_api import get_github_client
+
     token = os.environ.get("GITHUB_TOKEN")
-    since = datetime.now() - timedelta(days=delta_days)
-    repo_name = f"pyneng/{repo}"
     verify_ssl_cert = False if ignore_ssl_cert else True
-    try:
-        g = github.Github(token, verify=verify_ssl_cert)
-        repo_obj = g.get_repo(repo_name)
-    except github.GithubException:
-        raise AdvPynengError(
-            red("Аутентификация по токену не прошла. Задание не сдано на проверку")
-        )
-    else:
-        commits = repo_obj.get_commits(since=since)
-
-        try:
-            last = commits[0]
-        except IndexError:
-            print(f"За указанный период времени {delta_days} дней не найдено коммитов")
-        else:
-            last.create_comment(msg)
-            return last
+    client = get_github_client(token, verify_ssl_cert=verify_ssl_cert)
+    client.create_commit_comment(repo, commit_sha, msg)
 
 
 def send_tasks_to_check(
@@ -176,36 +187,62 @@ def send_tasks_to_check(
 ):
     """
     Функция отбирает все задания, которые прошли
-    тесты при вызове apyneng, делает git add для файлов заданий,
-    git commit с сообщением какие задания сделаны
-    и git push для добавления изменений на Github.
-    После этого к этому коммиту добавляется сообщение о том,
-    что задания сдаются на проверку с помощью функции post_comment_to_last_commit.
+    тесты при вызове apyneng, делает git add для файлов заданий
+    и git commit с сообщением какие задания сделаны.
+    Коммит и список заданий записываются в очередь сдачи заданий,
+    после чего очередь отправляется: git push и комментарий о сдаче
+    заданий к последнему коммиту (flush_submissions).
+    Если GitHub недоступен, задания остаются в очереди и будут отправлены
+    при следующем запуске apyneng или командой apyneng --flush.
+    Возвращает True, если задания отправлены, и False, если они остались
+    в очереди.
     """
+    from advpyneng_cli_course.submissions import (
+        enqueue_submission,
+        flush_submissions,
+    )
+
+    # имена файлов могут содержать каталог раздела, если задания
+    # сдаются сразу для нескольких разделов из каталога exercises
     ok_tasks = [
-        re.sub(r".*(task_\d+_\w+.py)", r"\1", filename) for filename in passed_tasks
+        re.sub(r"(?:test_)?(task_\d+_\w+.py)$", r"\1", filename)
+        for filename in passed_tasks
     ]
     tasks_num_only = sorted(
-        [task.replace("task_", "").replace(".py", "") for task in ok_tasks]
+        [
+            os.path.basename(task).replace("task_", "").replace(".py", "")
+            for task in ok_tasks
+        ]
     )
     message = f"Сделаны задания {' '.join(tasks_num_only)}"
 
+    paths_to_add = set(ok_tasks)
     for task in ok_tasks:
-        call_command(f"git add {task}")
         # добавление шаблонов для заданий jinja, textfsm
         if "20" in task or "21" in task:
-            call_command("git add templates")
+            paths_to_add.add("templates")
         elif "25" in task:
-            call_command("git add .")
-    save_changes_to_github(message, git_add_all=git_add_all, branch=branch)
-
+            paths_to_add.add(".")
     repo = get_repo()
-    last = post_comment_to_last_commit(message, repo, ignore_ssl_cert=ignore_ssl_cert)
-    commit_number = re.search(r'"(\w+)"', str(last)).group(1)
+    # все файлы добавляются одним вызовом git add
+    paths_to_add = sorted(path for path in paths_to_add if os.path.exists(path))
+    if paths_to_add:
+        print_git_result(git_add(paths_to_add))
+    commit_changes(message, git_add_all=git_add_all)
+    commit_sha = git_rev_parse("HEAD")
+    if not commit_sha:
+        raise AdvPynengError(red("В репозитории не найдено коммитов"))
+    enqueue_submission(repo, git_toplevel(), branch, commit_sha, tasks_num_only)
+
+    # повторные попытки только для текущего репозитория, сдачи других
+    # репозиториев из очереди отправляются один раз
+    sent = flush_submissions(ignore_ssl_cert=ignore_ssl_cert, current_repo=repo)
+    if repo not in sent:
+        return False
     print(
         green(
             f"Задание успешно сдано на проверку. Комментарий о сдаче задания "
-            f"можно посмотреть по ссылке https://github.com/pyneng/{repo}/commit/{commit_number}"
+            f"можно посмотреть по ссылке https://github.com/pyneng/{repo}/commit/{sent[repo]}"
         )
     )
     hint = (
@@ -213,7 +250,11 @@ def send_tasks_to_check(
         "[green on black]apyneng -c[/]\n\n"
         "Не забудьте посмотреть комментарии после проверки.\n"
     )
+    from rich import print as rprint
+    from rich.padding import Padding
+
     rprint(Padding(hint, (1, 0, 1, 4)))
+    return True
 
 
 def current_chapter_id():
@@ -231,72 +272,62 @@ def current_dir_name():
     return current_chapter_name
 
 
-def parse_json_report(report):
-    """
-    Отбирает нужные части из отчета запуска pytest в формате JSON.
-    Возвращает список тестов, которые прошли.
-    """
-    if report and report["summary"]["total"] != 0:
-        all_tests = defaultdict(list)
-        summary = report["summary"]
-
-        test_names = [test["nodeid"] for test in report["collectors"][0]["result"]]
-        for test in report["tests"]:
-            name = test["nodeid"].split("::")[0]
-            all_tests[name].append(test["outcome"] == "passed")
-        all_passed_tasks = [name for name, outcome in all_tests.items() if all(outcome)]
-        return all_passed_tasks
+def _raise_git_error(stderr):
+    if "could not resolve host" in stderr.lower():
+        raise AdvPynengError(
+            red(
+                "Не получилось клонировать репозиторий. Возможно нет доступа в интернет?"
+            )
+        )
     else:
-        return []
+        raise AdvPynengError(red(f"Не получилось скопировать файлы. {stderr}"))
 
 
-def git_clone_repo(repo_url, dst_dir):
-    returncode, stderr = call_command(
-        f"git clone {repo_url} {dst_dir}",
-        verbose=False,
-        return_stderr=True,
-    )
-    if returncode != 0:
-        if "could not resolve host" in stderr.lower():
-            raise AdvPynengError(
-                red(
-                    "Не получилось клонировать репозиторий. Возможно нет доступа в интернет?"
-                )
-            )
-        else:
-            raise AdvPynengError(red(f"Не получилось скопировать файлы. {stderr}"))
+def sparse_clone_or_update_repo(repo_url, repo_dir, paths):
+    """
+    Функция поддерживает локальную копию репозитория repo_url в каталоге
+    repo_dir, в которой есть только последний коммит и только каталоги paths.
+    Если копия уже есть, загружаются только изменения, а новые каталоги
+    добавляются в sparse checkout. Если копию не получилось обновить
+    (например, это полный клон от старой версии apyneng), она клонируется заново.
+    """
+    repo_dir = str(repo_dir)
+    if os.path.exists(repo_dir):
+        result = git_sparse_update(repo_dir, paths)
+        if result.returncode == 0:
+            return
+        if "could not resolve host" in result.stderr.lower():
+            _raise_git_error(result.stderr)
+        shutil.rmtree(repo_dir, onerror=remove_readonly)
+    result = git_sparse_clone(repo_url, repo_dir, paths)
+    if result.returncode != 0:
+        _raise_git_error(result.stderr)
 
 
 def copy_answers(passed_tasks):
     """
-    Функция клонирует репозиторий с ответами и копирует ответы для заданий,
-    которые прошли тесты.
+    Функция обновляет локальную копию репозитория с ответами
+    (~/.advpyneng-answers, только каталог ответов текущего раздела)
+    и копирует ответы для заданий, которые прошли тесты.
     """
     pth = str(pathlib.Path().absolute())
     current_chapter_name = os.path.split(pth)[-1]
-    current_chapter_number = int(current_chapter_name.split("_")[0])
-
-    homedir = pathlib.Path.home()
-    os.chdir(homedir)
-    if os.path.exists("advpyneng-answers"):
-        shutil.rmtree("advpyneng-answers", onerror=remove_readonly)
-    git_clone_repo(ANSWERS_URL, "advpyneng-answers")
-    os.chdir(os.path.join("advpyneng-answers", "answers", current_chapter_name))
-    copy_answer_files(passed_tasks, pth)
+
+    answers_repo_dir = pathlib.Path.home() / ".advpyneng-answers"
+    answers_chapter_path = f"answers/{current_chapter_name}"
+    sparse_clone_or_update_repo(ANSWERS_URL, answers_repo_dir, [answers_chapter_path])
+    copy_answer_files(passed_tasks, pth, answers_repo_dir / answers_chapter_path)
     print(
         green(
             "\nОтветы на задания, которые прошли тесты "
             "скопированы в файлы answer_task_x.py\n"
         )
     )
-    os.chdir(homedir)
-    shutil.rmtree("advpyneng-answers", onerror=remove_readonly)
-    os.chdir(pth)
 
 
-def copy_answer_files(passed_tasks, pth):
+def copy_answer_files(passed_tasks, pth, answers_pth):
     """
-    Функция копирует ответы для указанных заданий.
+    Функция копирует ответы для указанных заданий из каталога answers_pth.
     """
     for test_file in passed_tasks:
         task_name = test_file.replace("test_", "")
@@ -305,59 +336,57 @@ def copy_answer_files(passed_tasks, pth):
         answer_name = re.search(r"answer_task_\w+\.py", answer_name).group()
         pth_answer = os.path.join(pth, answer_name)
         if not os.path.exists(pth_answer):
-            shutil.copy2(task_name, pth_answer)
+            shutil.copy2(os.path.join(answers_pth, task_name), pth_answer)
 
 
-def clone_or_pull_task_repo():
-    course_tasks_repo_dir = ".advpyneng-course-tasks"
-    source_pth = str(pathlib.Path().absolute())
-    homedir = pathlib.Path.home()
-    os.chdir(homedir)
-    if os.path.exists(course_tasks_repo_dir):
-        os.chdir(course_tasks_repo_dir)
-        call_command("git pull")
-        os.chdir(homedir)
-    else:
-        git_clone_repo(TASKS_URL, course_tasks_repo_dir)
-    os.chdir(source_pth)
+def clone_or_pull_task_repo(chapters_list):
+    """
+    Функция обновляет локальную копию репозитория с заданиями
+    ~/.advpyneng-course-tasks. В копии есть только последний коммит и только
+    каталоги exercises/<раздел> для разделов, которые уже обновлялись.
+    Возвращает путь к каталогу exercises в локальной копии.
+    """
+    course_tasks_repo_dir = pathlib.Path.home() / ".advpyneng-course-tasks"
+    sparse_clone_or_update_repo(
+        TASKS_URL,
+        course_tasks_repo_dir,
+        [f"exercises/{chapter}" for chapter in chapters_list],
+    )
+    return course_tasks_repo_dir / "exercises"
 
 
 def copy_tasks_tests_from_repo(tasks, tests):
     """
     Функция клонирует репозиторий с последней версией заданий и копирует указанные
-    задания в текущий каталог.
+    задания в текущий каталог. Возвращает список изменений FileChange.
     """
     source_pth = str(pathlib.Path().absolute())
     current_chapter_name = os.path.split(source_pth)[-1]
-    current_chapter_number = int(current_chapter_name.split("_")[0])
 
-    clone_or_pull_task_repo()
-
-    course_tasks_repo_dir = ".advpyneng-course-tasks"
-    homedir = pathlib.Path.home()
-    os.chdir(
-        os.path.join(homedir, course_tasks_repo_dir, "exercises", current_chapter_name)
-    )
-    copy_task_test_files(source_pth, tasks, tests)
+    exercises_pth = clone_or_pull_task_repo([current_chapter_name])
+    os.chdir(exercises_pth / current_chapter_name)
+    changes = copy_task_test_files(source_pth, tasks, tests)
     print(green("\nОбновленные задания и тесты скопированы"))
     os.chdir(source_pth)
+    return changes
 
 
 def copy_task_test_files(source_pth, tasks=None, tests=None):
     """
-    Функция копирует файлы заданий и тестов.
+    Функция копирует файлы заданий и тестов, которые отличаются
+    от файлов в каталоге source_pth. Возвращает список изменений FileChange.
     """
     file_list = []
     if tasks:
         file_list += tasks
     if tests:
         file_list += tests
-    for file in file_list:
-        shutil.copy2(file, os.path.join(source_pth, file))
+    return sync_files(".", source_pth, files=file_list)
 
 
 def save_working_dir(branch="main"):
-    if not working_dir_clean():
+    status = git_status()
+    if not working_dir_clean(status):
         print(
             red(
                 "Обновление тестов и заданий перезапишет содержимое несохраненных файлов!".upper()
@@ -371,7 +400,9 @@ def save_working_dir(branch="main"):
         )
         if user_input.strip().lower() not in ("n", "no"):
             save_changes_to_github(
-                "Сохранение изменений перед обновлением заданий", branch=branch
+                "Сохранение изменений перед обновлением заданий",
+                branch=branch,
+                status=status,
             )
             print(
                 green(
@@ -380,11 +411,12 @@ def save_working_dir(branch="main"):
             )
 
 
-def working_dir_changed_diff(branch="main"):
+def working_dir_changed_diff(changes, branch="main"):
     print(red("Были обновлены такие файлы:"))
-    show_git_diff_short()
+    for line in format_changes(changes):
+        print(line)
     print(
-        "\nЭто короткий diff, если вы хотите посмотреть все отличия подробно, "
+        "\nЕсли вы хотите посмотреть все отличия подробно, "
         "нажмите n и дайте команду git diff.\n"
         "Также при желании можно отменить внесенные изменения git checkout -- file "
         "(или git restore file)."
@@ -397,48 +429,52 @@ def working_dir_changed_diff(branch="main"):
 
 def update_tasks_and_tests(tasks_list, tests_list, branch="main"):
     save_working_dir(branch=branch)
-    copy_tasks_tests_from_repo(tasks_list, tests_list)
-    if working_dir_clean():
+    changes = copy_tasks_tests_from_repo(tasks_list, tests_list)
+    if not changes:
         print(green("Задания и тесты уже последней версии"))
         return False
     else:
-        working_dir_changed_diff(branch=branch)
+        working_dir_changed_diff(changes, branch=branch)
         return True
 
 
 def update_chapters_tasks_and_tests(update_chapters, branch="main"):
     save_working_dir(branch=branch)
-    copy_chapters_from_repo(update_chapters)
-    if working_dir_clean():
+    changes = copy_chapters_from_repo(update_chapters)
+    if not changes:
         print(green("Все разделы уже последней версии"))
         return False
     else:
-        working_dir_changed_diff(branch=branch)
+        working_dir_changed_diff(changes, branch=branch)
         return True
 
 
 def copy_chapters_from_repo(chapters_list):
     """
     Функция клонирует репозиторий с последней версией заданий и копирует указанные
-    задания в текущий каталог.
+    задания в текущий каталог. Возвращает список изменений FileChange.
     """
     source_pth = str(pathlib.Path().absolute())
-    clone_or_pull_task_repo()
-
-    course_tasks_repo_dir = ".advpyneng-course-tasks"
-    homedir = pathlib.Path.home()
-    os.chdir(os.path.join(homedir, course_tasks_repo_dir, "exercises"))
-    copy_chapters(source_pth, chapters_list)
+    exercises_pth = clone_or_pull_task_repo(chapters_list)
+    os.chdir(exercises_pth)
+    changes = copy_chapters(source_pth, chapters_list)
     print(green("\nОбновленные разделы скопированы"))
     os.chdir(source_pth)
+    return changes
 
 
 def copy_chapters(source_pth, chapters_list):
     """
-    Функция копирует разделы
+    Функция синхронизирует разделы: копируются только измененные файлы,
+    файлы, которых нет в новой версии раздела, удаляются.
+    Возвращает список изменений FileChange с путями относительно source_pth.
     """
+    changes = []
     for chapter in chapters_list:
         to_path = os.path.join(source_pth, chapter)
-        if os.path.exists(to_path):
-            shutil.rmtree(to_path)
-        shutil.copytree(chapter, to_path)
+        chapter_changes = sync_files(chapter, to_path, remove_missing=True)
+        changes += [
+            change._replace(path=os.path.join(chapter, change.path))
+            for change in chapter_changes
+        ]
+    return changes
@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import time
+import traceback
+
+from advpyneng_cli_course.sync import IGNORED_DIRS
+from advpyneng_cli_course.cache import update_results_cache
+from advpyneng_cli_course.utils import green
+
+
+# как часто проверять файлы и сколько ждать после последнего изменения,
+# чтобы несколько сохранений подряд вызвали один запуск тестов
+POLL_INTERVAL = 0.2
+DEBOUNCE = 0.3
+
+
+def files_mtimes(dirs):
+    """
+    Функция возвращает словарь {путь: время изменения} для всех файлов
+    в каталогах dirs (включая подкаталоги, например, templates).
+    """
+    mtimes = {}
+    for root in dirs:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d not in IGNORED_DIRS]
+            for name in filenames:
+                path = os.path.normpath(os.path.join(dirpath, name))
+                try:
+                    mtimes[path] = os.stat(path).st_mtime_ns
+                except OSError:
+                    pass
+    return mtimes
+
+
+def changed_files(old, new):
+    return {path for path in old.keys() | new.keys() if old.get(path) != new.get(path)}
+
+
+def affected_tests(test_files, changed):
+    """
+    Функция возвращает тесты из test_files, на которые влияют изменения:
+    для task_X.py и test_task_X.py это test_task_X.py, изменение любого
+    другого файла раздела (conftest.py, вспомогательные модули, шаблоны)
+    влияет на все тесты этого раздела.
+    """
+    affected = set()
+    for path in changed:
+        name = os.path.basename(path)
+        chapter_tests = [f for f in test_files if _chapter(f) == _chapter(path)]
+        if name.startswith("test_task_"):
+            task_tests = [f for f in chapter_tests if os.path.basename(f) == name]
+        elif name.startswith("task_"):
+            task_tests = [
+                f for f in chapter_tests if os.path.basename(f) == f"test_{name}"
+            ]
+        elif name.startswith("answer_task_") or not name.endswith(
+            (".py", ".yaml", ".yml", ".txt", ".j2", ".template")
+        ):
+            # ответы и служебные файлы на тесты не влияют
+            task_tests = []
+        else:
+            task_tests = chapter_tests
+        affected.update(task_tests)
+    return [f for f in test_files if f in affected]
+
+
+def _chapter(path):
+    return os.path.normpath(os.path.dirname(path))
+
+
+def run_in_child(test_files, pytest_args):
+    """
+    Запускает сессию pytest в дочернем процессе, который создается через fork
+    из процесса с уже загруженными модулями, поэтому тесты запускаются
+    быстро, а модули заданий загружаются заново при каждом запуске.
+    В Windows нет fork, поэтому тесты запускаются в текущем процессе.
+    Возвращает результаты (как OutcomeCollector.results()).
+    """
+    from advpyneng_cli_course.runner import run_pytest_session
+
+    if not hasattr(os, "fork"):
+        output, results = run_pytest_session(test_files, pytest_args)
+        return results
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        exit_code = 0
+        try:
+            output, results = run_pytest_session(test_files, pytest_args)
+            with os.fdopen(write_fd, "w", encoding="utf-8") as f:
+                json.dump(results, f)
+        except KeyboardInterrupt:
+            exit_code = 1
+        except Exception:
+            traceback.print_exc()
+            exit_code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+    os.close(write_fd)
+    with os.fdopen(read_fd, encoding="utf-8") as f:
+        result = f.read()
+    os.waitpid(pid, 0)
+    return json.loads(result) if result else {"tasks": {}, "tests": {}}
+
+
+def watch_tests(test_files, pytest_args):
+    """
+    Функция запускает тесты test_files, а затем при каждом сохранении
+    файлов в каталогах разделов запускает только тесты, на которые
+    повлияли изменения. Работа завершается по Ctrl+C.
+    """
+    from advpyneng_cli_course.daemon import preload_modules
+
+    preload_modules()
+    if sys.stdout.isatty():
+        pytest_args = [*pytest_args, "--color=yes"]
+    dirs = sorted({_chapter(f) for f in test_files})
+    to_run = list(test_files)
+    mtimes = files_mtimes(dirs)
+    try:
+        while True:
+            if to_run:
+                results = run_in_child(to_run, pytest_args)
+                update_results_cache(results["tasks"], results["tests"])
+                print(
+                    green(
+                        "Ожидание изменений в файлах заданий "
+                        "(для завершения нажмите Ctrl+C)"
+                    )
+                )
+            to_run = []
+            while not to_run:
+                time.sleep(POLL_INTERVAL)
+                new_mtimes = files_mtimes(dirs)
+                changed = changed_files(mtimes, new_mtimes)
+                if not changed:
+                    continue
+                # ждем, пока файлы перестанут меняться
+                while True:
+                    time.sleep(DEBOUNCE)
+                    latest = files_mtimes(dirs)
+                    if latest == new_mtimes:
+                        break
+                    changed |= changed_files(new_mtimes, latest)
+                    new_mtimes = latest
+                mtimes = new_mtimes
+                to_run = affected_tests(test_files, changed)
+    except KeyboardInterrupt:
+        print()
@@ -0,0 +1,48 @@
+import sys
+import subprocess
+
+
+# общее время импорта advpyneng_cli_course.apyneng в мс (python -X importtime),
+# до отложенного импорта pytest, rich и PyGithub было около 300 мс
+IMPORT_TIME_BUDGET_MS = 150
+HEAVY_MODULES = ["pytest", "_pytest", "rich", "requests", "github"]
+
+
+def import_apyneng():
+    code = (
+        "import sys, json\n"
+        "import advpyneng_cli_course.apyneng\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))\n"
+    )
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def cumulative_import_time_ms(importtime_output, module):
+    for line in importtime_output.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1000
+    raise AssertionError(f"{module} нет в выводе -X importtime")
+
+
+def test_heavy_modules_not_imported():
+    result = import_apyneng()
+    assert result.stdout.strip() == "[]"
+
+
+def test_import_time_budget():
+    # минимальное время из нескольких запусков, чтобы не зависеть от
+    # случайной нагрузки на машине
+    times = [
+        cumulative_import_time_ms(
+            import_apyneng().stderr, "advpyneng_cli_course.apyneng"
+        )
+        for _ in range(3)
+    ]
+    assert min(times) < IMPORT_TIME_BUDGET_MS